@@ -0,0 +1,291 @@
+"""
+Library API for headless use of Magic Remover.
+
+    from api import remove_video_watermark, remove_pdf_watermark, process_directory
+
+    remove_video_watermark("talk.mp4", "talk_fixed.mp4", region="notebooklm")
+    summary = process_directory("exports/", "out/", workers=4)
+"""
+import glob
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import fitz  # PyMuPDF
+
+from processor import process_video_with_mask
+from document_processor import remove_watermark_from_pdf
+from hashing import file_sha256
+from metrics import JobMetrics
+from encoder_profiles import DEFAULT_PROFILE
+from watermark_detector import detect_static_overlay
+from region_presets import normalized_region, region_plan
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.webm', '.avi', '.m4v')
+PDF_EXTENSIONS = ('.pdf',)
+
+STATE_FILE = '.magic-remover-state.json'
+
+# Settings that change a file's output, with their defaults, per file kind.
+# The resume state is keyed by them too, so a rerun with other settings reprocesses.
+VIDEO_SETTINGS = {'engine': 'moviepy', 'backend': 'telea', 'encoder_profile': DEFAULT_PROFILE,
+                  'memory_budget_mb': None}
+PDF_SETTINGS = {'pdf_mode': 'redact'}
+
+# Preset used for PDFs when region is 'auto', which only videos can detect
+PDF_AUTO_FALLBACK = 'notebooklm'
+
+
+def _resolve_region(region, kind):
+    """Normalized (x, y, w, h) for a preset name or an explicit tuple."""
+    if isinstance(region, str):
+        return normalized_region(region, kind)
+    return tuple(region)
+
+
+def remove_video_watermark(input_path, output_path, region='notebooklm', progress_callback=None, backend='telea', **kwargs):
+    """
+    Remove a watermark from a video.
+    region: Preset name, normalized (x, y, w, h) tuple, or 'auto' to locate
+            the watermark with detect_static_overlay.
+    backend: Inpainting backend ('mean', 'patch', 'telea', 'ns' or 'auto').
+    Extra keyword arguments (workers, engine, encoder_profile,
+    memory_budget_mb, cache, stats, metrics) go to process_video_with_mask.
+    Returns (success, message).
+    """
+    if region == 'auto':
+        mask, _ = detect_static_overlay(input_path)
+        if mask is None:
+            return False, f"No static watermark found: {input_path}"
+        return process_video_with_mask(input_path, output_path, mask, progress_callback=progress_callback,
+                                       backend=backend, **kwargs)
+
+    cap = cv2.VideoCapture(input_path)
+    video_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    video_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    if not video_w or not video_h:
+        return False, f"Cannot read video: {input_path}"
+
+    # Cached per (region, size): no full-frame mask is built or scanned
+    plan = region_plan(_resolve_region(region, 'video'), video_w, video_h, backend)
+    return process_video_with_mask(input_path, output_path, plan, progress_callback=progress_callback, **kwargs)
+
+
+def remove_pdf_watermark(input_path, output_path, region='notebooklm', fill_color='auto', **kwargs):
+    """
+    Remove a watermark from every page of a PDF.
+    region: Preset name or normalized (x, y, w, h) tuple.
+    Extra keyword arguments (workers, mode, metrics) go to remove_watermark_from_pdf.
+    Returns (success, message).
+    """
+    if region == 'auto':
+        return False, "Automatic watermark detection is only available for videos"
+    rect = _resolve_region(region, 'pdf')
+    return remove_watermark_from_pdf(input_path, output_path, rect=rect, fill_color=fill_color, **kwargs)
+
+
+def _output_path(input_path, output_dir, suffix=''):
+    name, ext = os.path.splitext(os.path.basename(input_path))
+    if ext.lower() in VIDEO_EXTENSIONS:
+        ext = '.mp4'
+    return os.path.join(output_dir, f"{name}_fixed{suffix}{ext}")
+
+
+def _output_paths(input_paths, output_dir):
+    """
+    Output path of each input. Inputs that would share one (in/x/a.mp4 and
+    in/y/a.mp4, or a.mov and a.mp4) get a short hash of their absolute path
+    appended to the name, so no two files are written to the same output.
+    """
+    outputs = {path: _output_path(path, output_dir) for path in input_paths}
+    counts = {}
+    for output in outputs.values():
+        counts[output] = counts.get(output, 0) + 1
+    for path, output in outputs.items():
+        if counts[output] > 1:
+            tag = hashlib.sha256(os.path.abspath(path).encode('utf8')).hexdigest()[:8]
+            outputs[path] = _output_path(path, output_dir, '_' + tag)
+    return outputs
+
+
+def _count_units(input_path):
+    """Frames of a video or pages of a PDF."""
+    if input_path.lower().endswith(PDF_EXTENSIONS):
+        with fitz.open(input_path) as doc:
+            return len(doc)
+    cap = cv2.VideoCapture(input_path)
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return frames
+
+
+def process_file(input_path, output_dir, region='notebooklm', pdf_workers=1, pdf_mode='redact', output_path=None,
+                 **kwargs):
+    """
+    Process one video or PDF into output_dir.
+    output_path: Output file; defaults to <name>_fixed<ext> in output_dir.
+    pdf_workers: Worker processes splitting the pages of one PDF.
+    pdf_mode: 'redact' or 'objects' (see remove_watermark_from_pdf).
+    region: As for remove_video_watermark; PDFs use the PDF_AUTO_FALLBACK
+            preset for 'auto' and the record notes it.
+    Returns a summary dict with wall time, throughput, output size and the
+    job's metrics (per-stage times, counters, peak memory).
+    """
+    output_path = output_path or _output_path(input_path, output_dir)
+    is_pdf = input_path.lower().endswith(PDF_EXTENSIONS)
+    fallback = is_pdf and region == 'auto'
+    if fallback:
+        region = PDF_AUTO_FALLBACK
+
+    start = time.time()
+    metrics = JobMetrics('pdf' if is_pdf else 'video')
+    if is_pdf:
+        success, message = remove_pdf_watermark(input_path, output_path, region=region, workers=pdf_workers,
+                                                mode=pdf_mode, metrics=metrics)
+    else:
+        success, message = remove_video_watermark(input_path, output_path, region=region, metrics=metrics, **kwargs)
+    elapsed = time.time() - start
+
+    record = {
+        'input': input_path,
+        'output': output_path if success else None,
+        'success': success,
+        'message': message,
+        'wall_time': round(elapsed, 3),
+        'metrics': metrics.to_dict(),
+    }
+    if fallback:
+        record['region'] = region
+        record['message'] = f"{message} (no automatic detection for PDFs; used the {region} preset)"
+    if success:
+        units = _count_units(input_path)
+        rate = round(units / elapsed, 2) if elapsed > 0 else None
+        if is_pdf:
+            record.update(pages=units, pages_per_sec=rate)
+        else:
+            record.update(frames=units, frames_per_sec=rate)
+        record['output_size'] = os.path.getsize(output_path)
+    return record
+
+
+def collect_inputs(patterns):
+    """
+    Expand directories (non-recursive) and glob patterns into a sorted list
+    of supported video/PDF files.
+    """
+    extensions = VIDEO_EXTENSIONS + PDF_EXTENSIONS
+    paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            candidates = glob.glob(pattern, recursive=True)
+        for path in candidates:
+            if os.path.isfile(path) and path.lower().endswith(extensions):
+                paths.add(os.path.abspath(path))
+    return sorted(paths)
+
+
+def _state_key(digest, input_path, output_path, region, kwargs):
+    """
+    Resume state key of an input: its content hash, its output file name and
+    the settings that shape its output.
+    """
+    defaults = PDF_SETTINGS if input_path.lower().endswith(PDF_EXTENSIONS) else VIDEO_SETTINGS
+    settings = {name: kwargs.get(name, default) for name, default in defaults.items()}
+    settings['region'] = region if isinstance(region, str) else list(region)
+    payload = json.dumps({'input': digest, 'output': os.path.basename(output_path), 'settings': settings},
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode('utf8')).hexdigest()
+
+
+def _load_state(state_path):
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            return json.load(f)
+    return {}
+
+
+def _save_state(state_path, state):
+    # Write-then-rename so an interrupted run never leaves a corrupt state file
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def process_directory(inputs, output_dir, region='notebooklm', workers=1, state_path=None,
+                      summary_path=None, progress_callback=None, **kwargs):
+    """
+    Process many files in parallel, one file per worker process.
+    inputs: Directory, glob pattern, or a list of them.
+    workers: Number of files processed at once.
+    state_path: JSON file recording finished inputs by content hash, output
+                file and output settings (region, engine, backend, encoder profile,
+                memory budget, PDF mode), so a rerun with the same settings
+                skips files that are already done. Defaults to a state file
+                inside output_dir.
+    summary_path: If given, the summary is also written there as JSON.
+    progress_callback: Function called with each finished file's record.
+    Extra keyword arguments go to process_file (pdf_workers, pdf_mode) and
+    from there to process_video_with_mask.
+    Returns the summary dict.
+    """
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    os.makedirs(output_dir, exist_ok=True)
+    state_path = state_path or os.path.join(output_dir, STATE_FILE)
+    state = _load_state(state_path)
+
+    start = time.time()
+    records = []
+    todo = {}
+    outputs = _output_paths(collect_inputs(inputs), output_dir)
+    for path, output_path in outputs.items():
+        digest = file_sha256(path)
+        key = _state_key(digest, path, output_path, region, kwargs)
+        done = state.get(key)
+        if done and done.get('output') and os.path.exists(done['output']):
+            records.append(dict(done, input=path, skipped=True))
+            continue
+        todo[path] = (digest, key)
+
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(process_file, path, output_dir, region, output_path=outputs[path], **kwargs): path
+                   for path in todo}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                record = {'input': path, 'output': None, 'success': False, 'message': str(e)}
+            digest, key = todo[path]
+            record['sha256'] = digest
+            if record['success']:
+                # The output file was overwritten; entries for other settings no longer describe it
+                for other in [k for k, done in state.items() if done.get('output') == record['output']]:
+                    del state[other]
+                state[key] = record
+                _save_state(state_path, state)
+            records.append(record)
+            if progress_callback:
+                progress_callback(record)
+
+    summary = {
+        'output_dir': output_dir,
+        'region': region,
+        'workers': workers,
+        'wall_time': round(time.time() - start, 3),
+        'processed': sum(1 for r in records if r['success'] and not r.get('skipped')),
+        'skipped': sum(1 for r in records if r.get('skipped')),
+        'failed': sum(1 for r in records if not r['success']),
+        'files': sorted(records, key=lambda r: r['input']),
+    }
+    if summary_path:
+        with open(summary_path, 'w') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    return summary
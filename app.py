@@ -1,11 +1,50 @@
 import gradio as gr
-import tempfile
+import asyncio
 import os
 import cv2
-import numpy as np
 from PIL import Image
-from processor import process_video_with_mask
-from document_processor import remove_watermark_from_pdf, get_pdf_preview
+from processor import InpaintCache, MaskPlan, stream_segments
+from inpainting import BackendStats
+from document_processor import get_pdf_page_array
+from job_runner import JobRunner, QueueFullError
+from job_service import FINISHED, JobService
+from metrics import MetricsRegistry, serve_metrics
+from encoder_profiles import DEFAULT_PROFILE
+from output_manager import OutputManager
+from result_cache import ResultCache
+from video_session import get_session
+from watermark_detector import detect_static_overlay
+from region_presets import REGION_PRESETS, normalized_region, preset_plan, preset_rect
+
+
+# 완료된 작업의 단계별 시간과 처리량 집계 (Prometheus 형식으로 내보낼 수 있음)
+registry = MetricsRegistry()
+
+# 같은 파일을 같은 설정으로 다시 처리하면 저장된 결과를 바로 반환 (용량 초과 시 가장 오래 안 쓴 것부터 삭제, 0이면 사용 안 함)
+result_cache_mb = float(os.environ.get("MAGIC_REMOVER_RESULT_CACHE_MB", 2048))
+results = ResultCache(os.environ.get("MAGIC_REMOVER_RESULT_CACHE_DIR"),
+                      max_bytes=int(result_cache_mb * 2**20)) if result_cache_mb > 0 else None
+
+# 동시에 실행되는 무거운 작업 수 제한 (초과분은 대기열, 대기열도 가득 차면 거절)
+runner = JobRunner(video_workers=2, pdf_workers=2, max_queued=8, registry=registry, results=results)
+
+# 핸들러는 작업 ID만 받고 진행 이벤트(단계, 진행률, fps, 남은 시간)를 비동기로 기다림 - 작업 중에도 서버 워커를 잡지 않음
+jobs = JobService(runner)
+
+# 작업 결과 폴더: 오래되었거나(기본 2시간) 전체 용량(기본 4GB)을 넘으면 오래된 것부터 삭제
+output_dirs = OutputManager(
+    os.environ.get("MAGIC_REMOVER_OUTPUT_DIR"),
+    max_age=float(os.environ.get("MAGIC_REMOVER_OUTPUT_MAX_AGE_HOURS", 2)) * 3600,
+    max_bytes=int(float(os.environ.get("MAGIC_REMOVER_OUTPUT_MAX_MB", 4096)) * 2**20),
+)
+
+# 동영상 작업 하나가 쓰는 메모리 상한 (MB, 작업별 버퍼 기준이라 다른 작업과 미리보기 캐시는 제외).
+# 지정하면 프레임 버퍼 수를 맞추고, 맞출 수 없으면 해상도를 낮추거나 작업을 거절함
+memory_budget = os.environ.get("MAGIC_REMOVER_MEMORY_BUDGET_MB")
+memory_budget_mb = int(memory_budget) if memory_budget else None
+
+# 미리보기 슬라이더 위치 이후로 미리 디코딩해 둘 프레임 수
+PREVIEW_PREFETCH = 8
 
 
 # =====================
@@ -15,29 +54,43 @@ from document_processor import remove_watermark_from_pdf, get_pdf_preview
 def get_video_info(video_path):
     """동영상 업로드 시 정보와 첫 프레임 반환"""
     if video_path is None:
-        return None, "", 0, 0, 0, 0, gr.Slider(maximum=0, value=0)
+        return None, "", 0, 0, 0, 0, 0, 0, gr.Slider(maximum=0, value=0)
 
-    cap = cv2.VideoCapture(video_path)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    # 업로드 시 한 번 세션을 만들어 두고 미리보기에서 재사용
+    session = get_session(video_path, prefetch=PREVIEW_PREFETCH)
+    total_frames = session.frame_count
+    width = session.width
+    height = session.height
 
-    ret, frame = cap.read()
-    cap.release()
+    frame_rgb = session.frame(0)
 
-    if not ret or frame is None:
-        return None, "프레임을 읽을 수 없습니다.", 0, 0, 0, 0, gr.Slider(maximum=0, value=0)
+    if frame_rgb is None:
+        return None, "프레임을 읽을 수 없습니다.", 0, 0, 0, 0, 0, 0, gr.Slider(maximum=0, value=0)
 
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     info_text = f"📹 비디오 정보: {width}x{height}, 총 {total_frames} 프레임"
 
+    # 여러 구간의 프레임에서 변하지 않는 로고 영역을 자동 감지 (실패 시 기본값)
+    x_start, y_start, x_end, y_end = 1101, 660, 1238, 681
+    try:
+        _, roi = detect_static_overlay(video_path)
+    except Exception:
+        roi = None
+    if roi:
+        x, y, w, h = roi
+        x_start, y_start, x_end, y_end = x, y, x + w, y + h
+        info_text += f"\n🔍 워터마크 자동 감지: ({x_start}, {y_start}) ~ ({x_end}, {y_end})"
+    else:
+        info_text += "\n🔍 워터마크를 자동으로 찾지 못해 기본 좌표를 사용합니다."
+
     return (
         frame_rgb,
         info_text,
         width,
         height,
-        1101,  # default x_start
-        660,   # default y_start
+        x_start,
+        y_start,
+        x_end,
+        y_end,
         gr.Slider(maximum=max(total_frames - 1, 0), value=0),
     )
 
@@ -47,50 +100,169 @@ def update_frame_preview(video_path, frame_index, x_start, y_start, x_end, y_end
     if video_path is None:
         return None
 
-    cap = cv2.VideoCapture(video_path)
-    cap.set(cv2.CAP_PROP_POS_FRAMES, int(frame_index))
-    ret, frame = cap.read()
-    cap.release()
+    # 좌표만 바뀐 경우 캐시된 프레임을 그대로 사용하고 사각형만 다시 그림
+    frame_rgb = get_session(video_path, prefetch=PREVIEW_PREFETCH).frame(frame_index)
 
-    if not ret or frame is None:
+    if frame_rgb is None:
         return None
 
-    frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
     preview = frame_rgb.copy()
     cv2.rectangle(preview, (int(x_start), int(y_start)), (int(x_end), int(y_end)), (255, 0, 0), 3)
     return preview
 
 
-def process_video(video_path, x_start, y_start, x_end, y_end, progress=gr.Progress()):
-    """동영상 워터마크 제거 실행"""
-    if video_path is None:
-        return "동영상을 먼저 업로드하세요.", None, gr.DownloadButton(visible=False)
-
+def _video_size(video_path):
+    """
+    프레임 크기만 확인 (미리보기 세션과 같은 방식으로 읽음)
+    세션을 만들지 않으므로 일괄 처리 파일마다 키프레임 색인이나 미리 디코딩이 시작되지 않고,
+    미리보기 탭의 세션도 밀려나지 않음
+    """
     cap = cv2.VideoCapture(video_path)
-    video_w = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    video_h = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    size = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
     cap.release()
+    return size
 
-    x_start, y_start, x_end, y_end = int(x_start), int(y_start), int(x_end), int(y_end)
 
-    mask = np.zeros((video_h, video_w), dtype=np.uint8)
-    mask[y_start:y_end, x_start:x_end] = 255
+def _build_video_plan(video_path, x_start, y_start, x_end, y_end, preset=None, backend="telea"):
+    """좌표(또는 프리셋)로 마스크 플랜 생성 - 전체 프레임 마스크를 만들거나 스캔하지 않음"""
+    video_w, video_h = _video_size(video_path)
+
+    if preset:
+        # 프리셋은 정규화 좌표라 해상도에 맞게 변환되고, (프리셋, 크기, 방식)별로 캐시됨
+        return preset_plan(preset, video_w, video_h, backend)
+
+    x_start, y_start, x_end, y_end = int(x_start), int(y_start), int(x_end), int(y_end)
+    return MaskPlan.from_rects([(x_start, y_start, x_end - x_start, y_end - y_start)], (video_w, video_h),
+                               backend=backend)
+
+
+def _stream_dir(job):
+    """스트리밍 작업의 구간 파일 폴더"""
+    return os.path.join(os.path.dirname(job.output_path), "stream")
+
+
+def _release(job):
+    """작업 결과 폴더를 정리 대상으로 표시 (Gradio가 결과를 자체 캐시로 복사한 뒤에는 필요 없음)"""
+    output_dirs.release(os.path.dirname(job.output_path))
+
+
+def _submit_video(video_path, x_start, y_start, x_end, y_end, preset=None, backend="telea", encoder_profile=None,
+                  stream=False):
+    """
+    동영상 작업을 대기열에 등록 (대기열이 가득 차면 QueueFullError)
+    stream: 처리된 구간을 _stream_dir(job)에 순서대로 기록 (ROI 엔진으로 처리)
+    """
+    mask = _build_video_plan(video_path, x_start, y_start, x_end, y_end, preset, backend)
+    engine = "roi" if stream else "moviepy"
+    # 결과를 결정하는 설정 (입력 파일 해시와 함께 결과 캐시 키가 됨)
+    result_params = {
+        "kind": "video",
+        "preset": preset,
+        "rect": None if preset else [int(x_start), int(y_start), int(x_end), int(y_end)],
+        "backend": backend,
+        "engine": engine,
+        "encoder_profile": encoder_profile or DEFAULT_PROFILE,
+        "memory_budget_mb": memory_budget_mb,
+    }
 
     # 원본 파일명 기반 출력 파일명 생성
     original_name = os.path.splitext(os.path.basename(video_path))[0]
-    output_dir = tempfile.mkdtemp()
+    output_dir = output_dirs.new_dir()
     output_path = os.path.join(output_dir, f"{original_name}_fixed.mp4")
 
-    def update_progress(p):
-        progress(p, desc=f"처리 중... {int(p * 100)}%")
-
-    success, message = process_video_with_mask(video_path, output_path, mask, progress_callback=update_progress)
+    options = {"engine": engine}
+    if stream:
+        stream_dir = os.path.join(output_dir, "stream")
+        os.makedirs(stream_dir)
+        options["stream_dir"] = stream_dir
+
+    # 정적인 슬라이드 구간은 이전 프레임의 복원 결과를 재사용
+    cache = InpaintCache(tolerance=1.0)
+    stats = BackendStats()
+    try:
+        job = runner.submit_video(video_path, output_path, mask, result_params=result_params, cache=cache, stats=stats,
+                                  encoder_profile=encoder_profile, memory_budget_mb=memory_budget_mb, **options)
+    except QueueFullError:
+        output_dirs.release(output_dir)
+        raise
+    return job, cache, stats
+
+
+async def process_video(video_path, x_start, y_start, x_end, y_end, backend="telea", encoder_profile=DEFAULT_PROFILE,
+                        stream=True, progress=gr.Progress()):
+    """
+    동영상 워터마크 제거 실행
+    stream이면 처리가 끝난 구간부터 (상태, 스트리밍 구간, 결과, 다운로드)로 내보내
+    전체 처리가 끝나기 전에 재생을 시작할 수 있음
+    """
+    if video_path is None:
+        yield "동영상을 먼저 업로드하세요.", None, None, gr.DownloadButton(visible=False)
+        return
+
+    try:
+        job, cache, stats = await asyncio.to_thread(_submit_video, video_path, x_start, y_start, x_end, y_end,
+                                                    backend=backend, encoder_profile=encoder_profile, stream=stream)
+    except QueueFullError:
+        yield "❌ 처리 대기열이 가득 찼습니다. 잠시 후 다시 시도하세요.", None, None, gr.DownloadButton(visible=False)
+        return
+
+    job_id = await jobs.track(job)
+    try:
+        async for update in _follow_video_job(job_id, cache, stats, video_path, stream, progress):
+            yield update
+    finally:
+        # 취소 버튼이나 연결 끊김으로 핸들러가 중단되면 작업도 중단 (ffmpeg 종료, 작업 슬롯 반환)
+        jobs.cancel(job_id)
+        _release(job)
+
+
+def _progress_text(event, cache):
+    """진행 이벤트를 진행 표시줄 문구로 변환"""
+    text = f"처리 중 ({event['stage']})... {event['percent']:.0f}%"
+    if event["fps"]:
+        text += f" · {event['fps']:.1f} fps"
+    if event["eta"] is not None:
+        text += f" · 남은 시간 약 {event['eta']:.0f}초"
+    return text + f" (캐시 적중 {cache.hits}/{cache.hits + cache.misses})"
+
+
+async def _follow_video_job(job_id, cache, stats, video_path, stream, progress):
+    """진행 이벤트를 표시하고, 완성된 스트리밍 구간과 최종 결과를 차례로 내보냄"""
+    job = jobs.get(job_id)
+    sent = 0
+    async for event in jobs.events(job_id):
+        if event["status"] == "queued":
+            progress(0, desc="대기 중...")
+        elif event["status"] == "running":
+            progress(event["percent"] / 100, desc=_progress_text(event, cache))
+        if stream:
+            # 완성된 구간만 목록에 올라오므로 순서대로 한 번씩 전송
+            for segment in stream_segments(_stream_dir(job))[sent:]:
+                sent += 1
+                yield f"처리 중... 구간 {sent} 재생 가능", segment, None, gr.DownloadButton(visible=False)
+
+    if job.status == "cancelled":
+        yield "⏹️ 작업이 취소되었습니다.", None, None, gr.DownloadButton(visible=False)
+        return
+
+    success, message = job.result
+    output_path = job.output_path
+    original_name = os.path.splitext(os.path.basename(video_path))[0]
 
     if success:
         download_name = f"{original_name}_fixed.mp4"
-        return f"✅ 워터마크 제거 완료!", output_path, gr.DownloadButton(value=output_path, label=f"📥 {download_name} 다운로드", visible=True)
+        status = "✅ 워터마크 제거 완료!"
+        if job.metrics.counters["result_hits"]:
+            status += " (같은 파일·설정의 이전 결과 재사용)"
+        if stats.calls:
+            # 방식별 프레임당 복원 시간 (캐시 적중 프레임 제외)
+            status += f"\n복원 시간: {stats}"
+        stages = ", ".join(f"{name} {seconds:.1f}s" for name, seconds in job.metrics.stages.items())
+        status += f"\n단계별 시간: {stages}"
+        yield status, None, output_path, gr.DownloadButton(value=output_path, label=f"📥 {download_name} 다운로드",
+                                                           visible=True)
     else:
-        return f"❌ 오류: {message}", None, gr.DownloadButton(visible=False)
+        yield f"❌ 오류: {message}", None, None, gr.DownloadButton(visible=False)
 
 
 # =====================
@@ -112,15 +284,16 @@ def get_pdf_info(pdf_path, x_start, y_start, x_end, y_end):
     if path is None:
         return None, "", 0, 0
 
-    pil_image, error_msg = get_pdf_preview(path, 0)
+    page_image, error_msg = get_pdf_page_array(path, 0)
 
     if error_msg:
         return None, error_msg, 0, 0
 
-    img_w, img_h = pil_image.size
+    img_h, img_w = page_image.shape[:2]
     info_text = f"📄 PDF 크기: {img_w}x{img_h} 픽셀"
 
-    preview = np.array(pil_image)
+    # 캐시된 렌더링 결과 위에 사각형만 다시 그림
+    preview = page_image.copy()
     cv2.rectangle(preview, (int(x_start), int(y_start)), (int(x_end), int(y_end)), (255, 0, 0), 3)
     return preview, info_text, img_w, img_h
 
@@ -131,48 +304,179 @@ def update_pdf_preview(pdf_path, x_start, y_start, x_end, y_end):
     if path is None:
         return None
 
-    pil_image, error_msg = get_pdf_preview(path, 0)
-    if error_msg or pil_image is None:
+    page_image, error_msg = get_pdf_page_array(path, 0)
+    if error_msg or page_image is None:
         return None
 
-    preview = np.array(pil_image)
+    # 캐시된 렌더링 결과 위에 사각형만 다시 그림
+    preview = page_image.copy()
     cv2.rectangle(preview, (int(x_start), int(y_start)), (int(x_end), int(y_end)), (255, 0, 0), 3)
     return preview
 
 
-def process_pdf(pdf_path, x_start, y_start, x_end, y_end):
+def _submit_pdf(path, x_start, y_start, x_end, y_end, preset=None, mode="redact"):
+    """PDF 작업을 대기열에 등록 (미리보기 실패 시 None, 대기열이 가득 차면 QueueFullError)"""
+    if preset:
+        rect_coords = normalized_region(preset, 'pdf')
+    else:
+        page_image, _ = get_pdf_page_array(path, 0)
+        if page_image is None:
+            return None
+
+        img_h, img_w = page_image.shape[:2]
+        x_start, y_start, x_end, y_end = int(x_start), int(y_start), int(x_end), int(y_end)
+
+        nx = x_start / img_w
+        ny = y_start / img_h
+        nw = (x_end - x_start) / img_w
+        nh = (y_end - y_start) / img_h
+        rect_coords = (nx, ny, nw, nh)
+
+    # 원본 파일명 기반 출력 파일명 생성
+    original_name = os.path.splitext(os.path.basename(path))[0]
+    output_dir = output_dirs.new_dir()
+    output_path = os.path.join(output_dir, f"{original_name}_fixed.pdf")
+
+    try:
+        result_params = {"kind": "pdf", "rect": [round(v, 6) for v in rect_coords], "fill_color": "auto", "mode": mode}
+        return runner.submit_pdf(path, output_path, result_params=result_params, rect=rect_coords, fill_color="auto",
+                                 mode=mode)
+    except QueueFullError:
+        output_dirs.release(output_dir)
+        raise
+
+
+async def process_pdf(pdf_path, x_start, y_start, x_end, y_end, mode="redact"):
     """PDF 워터마크 제거 실행"""
     path = _resolve_pdf_path(pdf_path)
     if path is None:
         return "PDF를 먼저 업로드하세요.", gr.DownloadButton(visible=False)
 
-    pil_image, _ = get_pdf_preview(path, 0)
-    if pil_image is None:
+    try:
+        job = await asyncio.to_thread(_submit_pdf, path, x_start, y_start, x_end, y_end, mode=mode)
+    except QueueFullError:
+        return "❌ 처리 대기열이 가득 찼습니다. 잠시 후 다시 시도하세요.", gr.DownloadButton(visible=False)
+    if job is None:
         return "PDF 미리보기 생성 실패", gr.DownloadButton(visible=False)
 
-    img_w, img_h = pil_image.size
-    x_start, y_start, x_end, y_end = int(x_start), int(y_start), int(x_end), int(y_end)
-
-    nx = x_start / img_w
-    ny = y_start / img_h
-    nw = (x_end - x_start) / img_w
-    nh = (y_end - y_start) / img_h
-    rect_coords = (nx, ny, nw, nh)
-
-    # 원본 파일명 기반 출력 파일명 생성
+    job_id = await jobs.track(job)
+    try:
+        await jobs.wait(job_id)
+    finally:
+        jobs.cancel(job_id)
+        _release(job)
+    success, msg = job.result
+    output_path = job.output_path
     original_name = os.path.splitext(os.path.basename(path))[0]
-    output_dir = tempfile.mkdtemp()
-    output_path = os.path.join(output_dir, f"{original_name}_fixed.pdf")
-
-    success, msg = remove_watermark_from_pdf(path, output_path, rect=rect_coords, fill_color="auto")
 
     if success:
         download_name = f"{original_name}_fixed.pdf"
+        if job.metrics.counters["result_hits"]:
+            msg = "처리가 완료되었습니다. (같은 파일·설정의 이전 결과 재사용)"
         return f"✅ {msg}", gr.DownloadButton(value=output_path, label=f"📥 {download_name} 다운로드", visible=True)
     else:
         return f"❌ 실패: {msg}", gr.DownloadButton(visible=False)
 
 
+# =====================
+# Region Presets
+# =====================
+
+# (표시 이름, 프리셋 키) - 빈 키는 좌표 직접 입력
+PRESET_CHOICES = [("좌표 직접 입력", "")] + [(p["label"], name) for name, p in REGION_PRESETS.items()]
+
+# (표시 이름, 복원 방식) - 빠른 순서
+BACKEND_CHOICES = [
+    ("자동 (배경 질감에 따라 선택)", "auto"),
+    ("평균색 채우기 (가장 빠름, 단색 배경)", "mean"),
+    ("옆 영역 복사 (빠름, 무늬 배경)", "patch"),
+    ("TELEA (기본)", "telea"),
+    ("Navier-Stokes (느림, 그라데이션)", "ns"),
+]
+
+# (표시 이름, PDF 제거 방식)
+PDF_MODE_CHOICES = [
+    ("영역 덮기 (배경색 자동 감지)", "redact"),
+    ("워터마크 개체 삭제 (렌더링 없음, 빠르고 용량 작음)", "objects"),
+]
+
+# (표시 이름, 인코딩 프로필)
+ENCODER_CHOICES = [
+    ("빠른 미리보기 (ultrafast, 2000k)", "fast-preview"),
+    ("균형 (veryfast, CRF 23, 작은 용량)", "balanced"),
+    ("보관용 고화질 (slow, CRF 18)", "archival-crf"),
+]
+
+
+def apply_video_preset(preset, width, height):
+    """프리셋을 현재 동영상 해상도의 좌표로 변환"""
+    if not preset or not width or not height:
+        return gr.update(), gr.update(), gr.update(), gr.update()
+    return preset_rect(preset, width, height, 'video')
+
+
+def apply_pdf_preset(preset, width, height):
+    """프리셋을 현재 PDF 미리보기 크기의 좌표로 변환"""
+    if not preset or not width or not height:
+        return gr.update(), gr.update(), gr.update(), gr.update()
+    return preset_rect(preset, width, height, 'pdf')
+
+
+# =====================
+# Batch Tab Functions
+# =====================
+
+async def process_batch(files, preset, backend, vx_start, vy_start, vx_end, vy_end, px_start, py_start, px_end, py_end,
+                        pdf_mode="redact", progress=gr.Progress()):
+    """여러 파일 일괄 처리 (동영상/PDF 혼합 가능)"""
+    if not files:
+        return "파일을 먼저 업로드하세요.", None
+    preset = preset or None
+
+    batch = []  # (파일 이름, 작업 ID)
+    lines = []
+    for f in files:
+        path = _resolve_pdf_path(f)
+        name = os.path.basename(path)
+        try:
+            if path.lower().endswith(".pdf"):
+                job = await asyncio.to_thread(_submit_pdf, path, px_start, py_start, px_end, py_end, preset, pdf_mode)
+                if job is None:
+                    lines.append(f"❌ {name}: PDF 미리보기 생성 실패")
+                    continue
+            else:
+                job, _, _ = await asyncio.to_thread(_submit_video, path, vx_start, vy_start, vx_end, vy_end, preset,
+                                                    backend)
+        except QueueFullError:
+            lines.append(f"⏸️ {name}: 대기열이 가득 차 거절되었습니다.")
+            continue
+        batch.append((name, await jobs.track(job)))
+
+    try:
+        while not all(jobs.get(job_id).done for _, job_id in batch):
+            events = [jobs.event(job_id) for _, job_id in batch]
+            finished = sum(event["status"] in FINISHED for event in events)
+            p = sum(event["percent"] for event in events) / 100 / len(batch)
+            progress(p, desc=f"일괄 처리 중... {finished}/{len(batch)} 완료")
+            await asyncio.sleep(0.5)
+    finally:
+        for _, job_id in batch:
+            jobs.cancel(job_id)
+
+    outputs = []
+    for name, job_id in batch:
+        job = jobs.get(job_id)
+        _release(job)
+        success, msg = job.result
+        if success:
+            outputs.append(job.output_path)
+            lines.append(f"✅ {name}")
+        else:
+            lines.append(f"❌ {name}: {msg}")
+
+    return "\n".join(lines), outputs or None
+
+
 # =====================
 # Build Gradio UI
 # =====================
@@ -185,7 +489,7 @@ with gr.Blocks(title="NotebookLM 워터마크 제거기", theme=gr.themes.Soft()
         # --- Video Tab ---
         with gr.TabItem("🎬 동영상 (Video)"):
             gr.Markdown("## 동영상 워터마크 제거")
-            gr.Markdown("💡 기본값으로 오른쪽 하단 로고 좌표가 설정됩니다. 필요시 수정 가능합니다!")
+            gr.Markdown("💡 업로드하면 워터마크 위치를 자동으로 감지합니다. 찾지 못하면 오른쪽 하단 로고 좌표가 기본값으로 설정됩니다. 필요시 수정 가능합니다!")
 
             video_input = gr.Video(label="동영상 파일 업로드 (Upload Video)")
             video_info = gr.Textbox(label="비디오 정보", interactive=False)
@@ -198,7 +502,9 @@ with gr.Blocks(title="NotebookLM 워터마크 제거기", theme=gr.themes.Soft()
             frame_preview = gr.Image(label="미리보기 (빨간 사각형 = 제거 영역)")
 
             gr.Markdown("### 워터마크 영역 설정")
-            gr.Markdown("좌표를 입력하세요. (0,0)은 좌측 상단입니다.")
+            gr.Markdown("좌표를 입력하거나 프리셋을 선택하세요. (0,0)은 좌측 상단입니다.")
+
+            vid_preset = gr.Dropdown(label="영역 프리셋 (해상도에 맞게 자동 변환)", choices=PRESET_CHOICES, value="")
 
             with gr.Row():
                 vid_x_start = gr.Number(label="X 시작", value=1101, precision=0)
@@ -206,8 +512,18 @@ with gr.Blocks(title="NotebookLM 워터마크 제거기", theme=gr.themes.Soft()
                 vid_x_end = gr.Number(label="X 끝", value=1238, precision=0)
                 vid_y_end = gr.Number(label="Y 끝", value=681, precision=0)
 
-            video_btn = gr.Button("🎬 동영상 워터마크 제거 시작", variant="primary")
+            with gr.Row():
+                vid_backend = gr.Dropdown(label="복원 방식", choices=BACKEND_CHOICES, value="telea")
+                vid_encoder = gr.Dropdown(label="인코딩 프로필", choices=ENCODER_CHOICES, value=DEFAULT_PROFILE)
+
+            vid_stream = gr.Checkbox(label="처리 중 미리보기 (끝난 구간부터 재생, ROI 엔진 사용)", value=True)
+
+            with gr.Row():
+                video_btn = gr.Button("🎬 동영상 워터마크 제거 시작", variant="primary")
+                video_cancel = gr.Button("⏹️ 취소", variant="stop")
             video_status = gr.Textbox(label="상태", interactive=False)
+            # 처리된 구간이 생기는 대로 이어서 재생 (구간에는 소리가 없고, 최종 결과에는 원본 오디오 포함)
+            video_stream = gr.Video(label="처리 중 미리보기 (소리 없음)", streaming=True, autoplay=True)
             video_output = gr.Video(label="결과 미리보기")
             video_download = gr.DownloadButton("📥 결과 동영상 다운로드", visible=False, variant="secondary")
 
@@ -215,7 +531,14 @@ with gr.Blocks(title="NotebookLM 워터마크 제거기", theme=gr.themes.Soft()
             video_input.change(
                 fn=get_video_info,
                 inputs=[video_input],
-                outputs=[frame_preview, video_info, vid_width, vid_height, vid_x_start, vid_y_start, frame_slider],
+                outputs=[frame_preview, video_info, vid_width, vid_height, vid_x_start, vid_y_start, vid_x_end, vid_y_end, frame_slider],
+            )
+
+            # Events - preset selection
+            vid_preset.change(
+                fn=apply_video_preset,
+                inputs=[vid_preset, vid_width, vid_height],
+                outputs=[vid_x_start, vid_y_start, vid_x_end, vid_y_end],
             )
 
             # Events - frame slider & coordinate changes
@@ -226,12 +549,15 @@ with gr.Blocks(title="NotebookLM 워터마크 제거기", theme=gr.themes.Soft()
                     outputs=[frame_preview],
                 )
 
-            # Events - process button
-            video_btn.click(
+            # Events - process button (작업 수는 JobRunner가 제한하므로 이벤트 동시 실행 수는 제한하지 않음)
+            video_event = video_btn.click(
                 fn=process_video,
-                inputs=[video_input, vid_x_start, vid_y_start, vid_x_end, vid_y_end],
-                outputs=[video_status, video_output, video_download],
+                inputs=[video_input, vid_x_start, vid_y_start, vid_x_end, vid_y_end, vid_backend, vid_encoder, vid_stream],
+                outputs=[video_status, video_stream, video_output, video_download],
+                concurrency_limit=None,
             )
+            # 핸들러가 중단되면 작업의 ffmpeg도 함께 종료됨
+            video_cancel.click(fn=None, cancels=[video_event])
 
         # --- PDF Tab ---
         with gr.TabItem("📄 문서 (PDF)"):
@@ -249,7 +575,9 @@ with gr.Blocks(title="NotebookLM 워터마크 제거기", theme=gr.themes.Soft()
             pdf_preview = gr.Image(label="미리보기 (빨간 사각형 = 제거 영역)")
 
             gr.Markdown("### 워터마크 영역 설정")
-            gr.Markdown("좌표를 입력하세요. (0,0)은 좌측 상단입니다.")
+            gr.Markdown("좌표를 입력하거나 프리셋을 선택하세요. (0,0)은 좌측 상단입니다.")
+
+            pdf_preset = gr.Dropdown(label="영역 프리셋 (페이지 크기에 맞게 자동 변환)", choices=PRESET_CHOICES, value="")
 
             with gr.Row():
                 pdf_x_start = gr.Number(label="X 시작", value=1265, precision=0)
@@ -257,6 +585,8 @@ with gr.Blocks(title="NotebookLM 워터마크 제거기", theme=gr.themes.Soft()
                 pdf_x_end = gr.Number(label="X 끝", value=1369, precision=0)
                 pdf_y_end = gr.Number(label="Y 끝", value=762, precision=0)
 
+            pdf_mode = gr.Radio(label="제거 방식", choices=PDF_MODE_CHOICES, value="redact")
+
             pdf_btn = gr.Button("📄 워터마크 제거 시작", variant="primary")
             pdf_status = gr.Textbox(label="상태", interactive=False)
             pdf_output = gr.DownloadButton("📥 결과 PDF 다운로드", visible=False, variant="secondary")
@@ -268,6 +598,13 @@ with gr.Blocks(title="NotebookLM 워터마크 제거기", theme=gr.themes.Soft()
                 outputs=[pdf_preview, pdf_info, pdf_img_w, pdf_img_h],
             )
 
+            # Events - preset selection
+            pdf_preset.change(
+                fn=apply_pdf_preset,
+                inputs=[pdf_preset, pdf_img_w, pdf_img_h],
+                outputs=[pdf_x_start, pdf_y_start, pdf_x_end, pdf_y_end],
+            )
+
             # Events - coordinate changes
             for coord_input in [pdf_x_start, pdf_y_start, pdf_x_end, pdf_y_end]:
                 coord_input.change(
@@ -279,12 +616,60 @@ with gr.Blocks(title="NotebookLM 워터마크 제거기", theme=gr.themes.Soft()
             # Events - process button
             pdf_btn.click(
                 fn=process_pdf,
-                inputs=[pdf_input, pdf_x_start, pdf_y_start, pdf_x_end, pdf_y_end],
+                inputs=[pdf_input, pdf_x_start, pdf_y_start, pdf_x_end, pdf_y_end, pdf_mode],
                 outputs=[pdf_status, pdf_output],
+                concurrency_limit=None,
+            )
+
+        # --- Batch Tab ---
+        with gr.TabItem("📦 일괄 처리 (Batch)"):
+            gr.Markdown("## 📦 여러 파일 일괄 처리")
+            gr.Markdown("동영상과 PDF를 한 번에 올리면 각각 아래 좌표로 처리합니다. 대기열이 가득 차면 일부 파일은 거절될 수 있습니다.")
+
+            batch_input = gr.File(label="파일 업로드 (여러 개 선택 가능)", file_count="multiple",
+                                  file_types=["video", ".pdf"])
+
+            batch_preset = gr.Dropdown(label="영역 프리셋 (선택 시 파일마다 해상도에 맞게 변환, 아래 좌표는 무시)",
+                                       choices=PRESET_CHOICES, value="notebooklm")
+            with gr.Row():
+                batch_backend = gr.Dropdown(label="동영상 복원 방식", choices=BACKEND_CHOICES, value="telea")
+                batch_pdf_mode = gr.Dropdown(label="PDF 제거 방식", choices=PDF_MODE_CHOICES, value="redact")
+
+            gr.Markdown("### 동영상 워터마크 영역")
+            with gr.Row():
+                batch_vx_start = gr.Number(label="X 시작", value=1101, precision=0)
+                batch_vy_start = gr.Number(label="Y 시작", value=660, precision=0)
+                batch_vx_end = gr.Number(label="X 끝", value=1238, precision=0)
+                batch_vy_end = gr.Number(label="Y 끝", value=681, precision=0)
+
+            gr.Markdown("### PDF 워터마크 영역 (첫 페이지 미리보기 픽셀 기준)")
+            with gr.Row():
+                batch_px_start = gr.Number(label="X 시작", value=1265, precision=0)
+                batch_py_start = gr.Number(label="Y 시작", value=745, precision=0)
+                batch_px_end = gr.Number(label="X 끝", value=1369, precision=0)
+                batch_py_end = gr.Number(label="Y 끝", value=762, precision=0)
+
+            batch_btn = gr.Button("📦 일괄 처리 시작", variant="primary")
+            batch_status = gr.Textbox(label="상태", interactive=False, lines=6)
+            batch_output = gr.File(label="결과 파일", file_count="multiple")
+
+            batch_btn.click(
+                fn=process_batch,
+                inputs=[batch_input, batch_preset, batch_backend, batch_vx_start, batch_vy_start, batch_vx_end, batch_vy_end,
+                        batch_px_start, batch_py_start, batch_px_end, batch_py_end, batch_pdf_mode],
+                outputs=[batch_status, batch_output],
+                concurrency_limit=None,
             )
 
     gr.Markdown("---")
     gr.Markdown("💡 팁: 좌표는 수정 가능합니다. 미리보기에서 빨간 사각형 위치를 확인하세요!")
 
 if __name__ == "__main__":
+    # MAGIC_REMOVER_METRICS_PORT를 지정하면 http://<host>:<port>/metrics 로 지표 노출
+    metrics_port = os.environ.get("MAGIC_REMOVER_METRICS_PORT")
+    if metrics_port:
+        serve_metrics(registry, int(metrics_port))
+
+    # 처리 요청은 작업 대기열(JobRunner)이 제한하므로 Gradio 대기열은 크기와 미리보기 등 동기 핸들러만 제한
+    demo.queue(default_concurrency_limit=8, max_size=32)
     demo.launch()
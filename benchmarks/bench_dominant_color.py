@@ -0,0 +1,66 @@
+"""
+Micro-benchmark: vectorized get_dominant_color vs. the original
+pure-Python implementation.
+
+    python -m benchmarks.bench_dominant_color
+"""
+import timeit
+from collections import Counter
+
+import fitz  # PyMuPDF
+
+from benchmarks.fixtures import make_page
+from document_processor import get_dominant_color
+
+
+def get_dominant_color_legacy(page, rect):
+    """The original implementation (two renders, per-pixel Python loop + Counter)."""
+    try:
+        pix = page.get_pixmap(clip=rect)
+        width, height = pix.width, pix.height
+        if width < 5 or height < 5:
+            return (1, 1, 1)
+        pix = page.get_pixmap(clip=rect, alpha=False)
+        samples = pix.samples
+        w = pix.width
+        h = pix.height
+        colors = []
+
+        def add_pixel(idx):
+            colors.append((samples[idx], samples[idx+1], samples[idx+2]))
+
+        for x in range(w):
+            add_pixel(x * 3)
+            add_pixel(((h - 1) * w + x) * 3)
+        for y in range(1, h - 1):
+            add_pixel((y * w) * 3)
+            add_pixel((y * w + (w - 1)) * 3)
+        if colors:
+            most_common = Counter(colors).most_common(1)[0][0]
+            return (most_common[0]/255.0, most_common[1]/255.0, most_common[2]/255.0)
+    except Exception:
+        pass
+    return (1, 1, 1)
+
+
+def main(number=200):
+    doc, page = make_page()
+    w, h = page.rect.width, page.rect.height
+    rects = {
+        "watermark 104x17": fitz.Rect(w - 111, h - 23, w - 7, h - 6),
+        "region 400x200": fitz.Rect(w - 420, h - 220, w - 20, h - 20),
+    }
+
+    print(f"{'rect':<18} {'legacy ms':>10} {'numpy ms':>10} {'speedup':>8}  colors (legacy / numpy / numpy q=3)")
+    for name, rect in rects.items():
+        legacy = timeit.timeit(lambda: get_dominant_color_legacy(page, rect), number=number) / number
+        vectorized = timeit.timeit(lambda: get_dominant_color(page, rect), number=number) / number
+        colors = [get_dominant_color_legacy(page, rect), get_dominant_color(page, rect),
+                  get_dominant_color(page, rect, quantize=3)]
+        shown = " / ".join("(%d,%d,%d)" % tuple(round(c * 255) for c in color) for color in colors)
+        print(f"{name:<18} {legacy * 1e3:>10.3f} {vectorized * 1e3:>10.3f} {legacy / vectorized:>7.1f}x  {shown}")
+    doc.close()
+
+
+if __name__ == "__main__":
+    main()
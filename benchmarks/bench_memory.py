@@ -0,0 +1,82 @@
+"""
+Memory check: the memory a budgeted job allocates must not grow with video length.
+
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --size 1080p --budget 64 --reference
+
+Processes the same slide video (with an AAC track) at two lengths with the
+pipe and roi engines under --budget, and with --reference also with the
+unbudgeted moviepy engine. Each run gets a fresh process. A job's memory is
+its RSS growth: the highest RSS sampled during the job minus the RSS when it
+started, so imports and the rest of the process are not counted. Exits with
+status 1 when a budgeted job's growth exceeds the budget or grows by more
+than --tolerance with the longer video.
+The defaults finish in about a minute; the repo has no test suite, so this
+check is run by hand.
+"""
+import argparse
+import os
+import sys
+
+from benchmarks.fixtures import ensure_fixtures
+from benchmarks.run import bench_process_video, run
+
+# Below this, a difference in RSS growth is allocator noise
+MIN_GROWTH_MB = 16
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_memory', description=__doc__.split('\n')[1])
+    parser.add_argument('--fixtures', default=os.path.join('benchmarks', '.fixtures'),
+                        help='Fixture cache directory (default: benchmarks/.fixtures)')
+    parser.add_argument('--size', default='720p', help='Video size (default: 720p)')
+    parser.add_argument('--short', type=int, default=3, help='Seconds of the short video (default: 3)')
+    parser.add_argument('--long', type=int, default=12, help='Seconds of the long video (default: 12)')
+    parser.add_argument('--budget', type=int, default=64, help='Memory budget in MB (default: 64)')
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help='Relative growth increase allowed (default: 0.10, at least %d MB)' % MIN_GROWTH_MB)
+    parser.add_argument('--reference', action='store_true',
+                        help='Also run the unbudgeted moviepy engine for comparison (slow)')
+    args = parser.parse_args(argv)
+
+    work_dir = os.path.join(args.fixtures, 'out')
+    os.makedirs(work_dir, exist_ok=True)
+    videos = {seconds: ensure_fixtures(args.fixtures, [args.size], seconds, pages=1, audio=True)['video'][args.size]
+              for seconds in (args.short, args.long)}
+
+    engines = [('pipe', args.budget), ('roi', args.budget)]
+    if args.reference:
+        engines.append(('moviepy', None))
+    cases = []
+    for engine, budget in engines:
+        for seconds, path in videos.items():
+            output = os.path.join(work_dir, 'memory_%s_%ds.mp4' % (engine, seconds))
+            cases.append(('memory/%s/%ds' % (engine, seconds), bench_process_video,
+                          {'video_path': path, 'output_path': output, 'engine': engine,
+                           'memory_budget_mb': budget}))
+    results = run(cases)['results']
+
+    failures = 0
+    for engine, budget in engines:
+        short = results['memory/%s/%ds' % (engine, args.short)]
+        long = results['memory/%s/%ds' % (engine, args.long)]
+        if 'metrics' not in short or 'metrics' not in long:
+            print('%-8s FAILED: %s' % (engine, short.get('error') or long.get('error')))
+            failures += 1
+            continue
+        short_mb = short['metrics']['rss_growth_mb']
+        long_mb = long['metrics']['rss_growth_mb']
+        growth = long_mb - short_mb
+        verdict = 'reference'
+        if budget is not None:
+            allowed = max(MIN_GROWTH_MB, short_mb * args.tolerance)
+            ok = growth <= allowed and long_mb <= budget
+            failures += not ok
+            verdict = 'ok' if ok else 'FAILED (allowed +%.0f MB, budget %d MB)' % (allowed, budget)
+        print('%-8s %3ds: %6.1f MB  %3ds: %6.1f MB  difference %+6.1f MB  %s' % (
+            engine, args.short, short_mb, args.long, long_mb, growth, verdict))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
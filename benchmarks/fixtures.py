@@ -0,0 +1,178 @@
+"""
+Synthetic benchmark fixtures, generated offline and cached on disk:
+slide-style videos with a stamped logo, and long PDFs with a corner
+watermark. Both put the watermark where the 'notebooklm' preset expects it.
+
+    python -m benchmarks.fixtures benchmarks/.fixtures
+"""
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import cv2
+import fitz  # PyMuPDF
+import numpy as np
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+from PIL import Image
+
+from region_presets import preset_rect
+
+VIDEO_SIZES = {
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+    '4k': (3840, 2160),
+}
+
+SLIDE_COLORS = [(238, 236, 226), (250, 250, 250), (226, 234, 244), (34, 38, 46)]
+
+
+def _slide_frame(width, height, index, seed=0):
+    """One slide: flat background, a title, bullet lines and a chart block."""
+    rng = np.random.default_rng(seed + index)
+    background = SLIDE_COLORS[index % len(SLIDE_COLORS)]
+    ink = (30, 30, 30) if sum(background) > 384 else (230, 230, 230)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = background
+
+    scale = height / 720
+    cv2.putText(frame, "Slide %d" % (index + 1), (int(80 * scale), int(110 * scale)),
+                cv2.FONT_HERSHEY_DUPLEX, 2.0 * scale, ink, max(1, int(3 * scale)), cv2.LINE_AA)
+    for line in range(int(rng.integers(3, 7))):
+        y = int((200 + line * 60) * scale)
+        words = " ".join("lorem" if rng.random() < 0.5 else "ipsum" for _ in range(int(rng.integers(3, 8))))
+        cv2.putText(frame, "- " + words, (int(100 * scale), y), cv2.FONT_HERSHEY_SIMPLEX,
+                    1.0 * scale, ink, max(1, int(2 * scale)), cv2.LINE_AA)
+    x0, y0 = int(width * 0.62), int(height * 0.3)
+    for bar in range(5):
+        h = int(rng.integers(40, 260) * scale)
+        color = tuple(int(c) for c in rng.integers(40, 220, 3))
+        x = x0 + int(bar * 70 * scale)
+        cv2.rectangle(frame, (x, y0 + int(300 * scale) - h), (x + int(50 * scale), y0 + int(300 * scale)), color, -1)
+    return frame
+
+
+def _stamp_logo(frame):
+    """Draw the NotebookLM-style wordmark where the preset expects it."""
+    height, width = frame.shape[:2]
+    x0, y0, x1, y1 = preset_rect('notebooklm', width, height)
+    cv2.rectangle(frame, (x0, y0), (x1, y1), (90, 90, 90), -1)
+    scale = (y1 - y0) / 30
+    cv2.putText(frame, "NotebookLM", (x0 + 2, y1 - max(2, (y1 - y0) // 5)), cv2.FONT_HERSHEY_SIMPLEX,
+                scale, (245, 245, 245), max(1, int(2 * scale)), cv2.LINE_AA)
+    return frame
+
+
+def _make_tone(path, seconds):
+    """AAC sine tone of the given length."""
+    subprocess.run([get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error', '-f', 'lavfi',
+                    '-i', 'sine=frequency=440:duration=%s' % seconds, '-c:a', 'aac', path], check=True)
+
+
+def make_slide_video(path, size='720p', seconds=6, fps=25, slide_seconds=2, audio=False):
+    """
+    Slide video: each slide holds for slide_seconds, with a static logo in
+    the bottom-right corner. size is a VIDEO_SIZES key or (width, height).
+    audio: Add an AAC sine tone track.
+    """
+    width, height = VIDEO_SIZES.get(size, size)
+    work_dir = tempfile.mkdtemp() if audio else None
+    audiofile = None
+    if audio:
+        audiofile = os.path.join(work_dir, 'tone.m4a')
+        _make_tone(audiofile, seconds)
+    writer = FFMPEG_VideoWriter(path, (width, height), fps, codec='libx264', preset='ultrafast', bitrate='2000k',
+                                audiofile=audiofile)
+    try:
+        frames_per_slide = int(slide_seconds * fps)
+        total = int(seconds * fps)
+        for start in range(0, total, frames_per_slide):
+            frame = _stamp_logo(_slide_frame(width, height, start // frames_per_slide))
+            for _ in range(min(frames_per_slide, total - start)):
+                writer.write_frame(frame)
+    finally:
+        writer.close()
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return path
+
+
+def _background_jpeg(width, height, background=(238, 236, 226), noise=3, seed=0):
+    """Noisy JPEG page background, like a rasterized slide export."""
+    rng = np.random.default_rng(seed)
+    pixels = np.clip(rng.normal(0, noise, (height, width, 3)) + background, 0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+def _stamp_page(page, width, height):
+    x0, y0, x1, y1 = preset_rect('notebooklm', width, height, kind='pdf')
+    page.insert_text((x0 + 2, y1 - 3), "NotebookLM", fontsize=14, color=(0.4, 0.4, 0.4))
+
+
+def make_page(width=1376, height=768, background=(238, 236, 226), noise=3, seed=0):
+    """A single slide page (noisy JPEG background, corner watermark). Returns (doc, page)."""
+    doc = fitz.open()
+    page = doc.new_page(width=width, height=height)
+    page.insert_image(page.rect, stream=_background_jpeg(width, height, background, noise, seed))
+    _stamp_page(page, width, height)
+    return doc, page
+
+
+def make_watermarked_pdf(path, pages=300, width=1376, height=768):
+    """
+    Slide-deck PDF: every page has the same JPEG background (stored once),
+    a footer bar running under the corner, a few text lines, and the
+    watermark in the bottom-right corner: its text plus a small vector mark.
+    The first page is a title slide with a full-page background rectangle.
+    The background rectangle and footer bars are not part of the watermark
+    and must survive 'objects' mode.
+    """
+    doc = fitz.open()
+    image = _background_jpeg(width, height)
+    x0, y0, x1, y1 = preset_rect('notebooklm', width, height, kind='pdf')
+    xref = 0
+    for i in range(pages):
+        page = doc.new_page(width=width, height=height)
+        xref = page.insert_image(page.rect, stream=image if not xref else None, xref=xref)
+        if i == 0:
+            page.draw_rect(page.rect, color=None, fill=(0.93, 0.95, 1.0))
+        page.draw_rect(fitz.Rect(0, y0 - 6, width, height), color=None, fill=(0.85, 0.85, 0.85))
+        page.draw_rect(fitz.Rect(x1 - 12, y0 + 4, x1 - 4, y1 - 4), color=(0.4, 0.4, 0.4), width=1)
+        page.insert_text((80, 110), "Slide %d" % (i + 1), fontsize=40)
+        for line in range(4):
+            page.insert_text((100, 200 + line * 60), "- lorem ipsum dolor sit amet %d" % line, fontsize=22)
+        _stamp_page(page, width, height)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
+
+
+def ensure_fixtures(directory, sizes=('720p', '1080p', '4k'), seconds=6, pages=300, audio=False):
+    """
+    Generate missing fixtures into directory and return their paths:
+    {'video': {size: path}, 'pdf': path}. Existing files are reused.
+    audio: Give the videos an AAC track.
+    """
+    os.makedirs(directory, exist_ok=True)
+    videos = {}
+    for size in sizes:
+        path = os.path.join(directory, 'slides_%s_%ds%s.mp4' % (size, seconds, '_audio' if audio else ''))
+        if not os.path.exists(path):
+            make_slide_video(path + '.tmp.mp4', size, seconds, audio=audio)
+            os.replace(path + '.tmp.mp4', path)
+        videos[size] = path
+
+    pdf = os.path.join(directory, 'deck_%dp.pdf' % pages)
+    if not os.path.exists(pdf):
+        make_watermarked_pdf(pdf + '.tmp.pdf', pages)
+        os.replace(pdf + '.tmp.pdf', pdf)
+    return {'video': videos, 'pdf': pdf}
+
+
+if __name__ == "__main__":
+    print(ensure_fixtures(sys.argv[1] if len(sys.argv) > 1 else os.path.join('benchmarks', '.fixtures')))
@@ -0,0 +1,280 @@
+"""
+Benchmark runner for the hot paths, writing machine-readable JSON.
+
+    python -m benchmarks.run -o results.json
+    python -m benchmarks.run --quick --compare baseline.json
+    python -m benchmarks.run --compare baseline.json results.json
+
+Every case runs in a fresh process, so its peak RSS is its own. Compare
+mode exits with status 1 when a metric regressed by more than --threshold
+relative to the baseline.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmarks.fixtures import ensure_fixtures
+
+# Metrics where larger is better; every other numeric metric is a cost
+HIGHER_IS_BETTER = ('fps', 'pages_per_sec')
+# Metrics that are recorded but too noisy or descriptive to compare
+NOT_COMPARED = ('frames', 'pages', 'calls', 'rss_growth_mb')
+
+
+def _peak_rss_mb():
+    from metrics import peak_rss_mb
+    return round(peak_rss_mb() or 0.0, 1)
+
+
+def bench_inpaint_frame(video_path, repeat=50):
+    """inpaint_frame_opencv and MaskPlan.apply on one frame of the video."""
+    import cv2
+    from processor import MaskPlan, inpaint_frame_opencv
+    from region_presets import preset_rect
+
+    cap = cv2.VideoCapture(video_path)
+    _, frame = cap.read()
+    cap.release()
+    height, width = frame.shape[:2]
+    x0, y0, x1, y1 = preset_rect('notebooklm', width, height)
+    mask = np.zeros((height, width), dtype=np.uint8)
+    mask[y0:y1, x0:x1] = 255
+    roi = (x0, y0, x1 - x0, y1 - y0)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        inpaint_frame_opencv(frame, mask, roi=roi)
+    function_s = (time.perf_counter() - start) / repeat
+
+    plan = MaskPlan(mask)
+    work = frame.copy()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        plan.apply(work)
+    plan_s = (time.perf_counter() - start) / repeat
+
+    return {
+        'metrics': {'fps': round(1 / function_s, 1), 'ms_per_frame': round(function_s * 1e3, 3),
+                    'plan_ms_per_frame': round(plan_s * 1e3, 3)},
+    }
+
+
+def bench_process_video(video_path, output_path, engine='moviepy', backend='telea', workers=1, encoder_profile=None,
+                        memory_budget_mb=None):
+    """process_video_with_mask with the notebooklm preset."""
+    from api import remove_video_watermark
+    from metrics import JobMetrics
+
+    metrics = JobMetrics('video')
+    start = time.perf_counter()
+    success, message = remove_video_watermark(video_path, output_path, engine=engine, backend=backend,
+                                              workers=workers, encoder_profile=encoder_profile, metrics=metrics,
+                                              memory_budget_mb=memory_budget_mb, progress_callback=lambda p: None)
+    wall = time.perf_counter() - start
+    if not success:
+        raise RuntimeError(message)
+    frames = metrics.counters['frames']
+    return {
+        'metrics': {'fps': round(frames / wall, 1), 'wall_s': round(wall, 3), 'frames': frames,
+                    'output_mb': round(metrics.counters['bytes_written'] / 2**20, 3),
+                    'rss_growth_mb': round(metrics.rss_growth_mb, 1)},
+        'stages': metrics.to_dict()['stages'],
+    }
+
+
+def bench_dominant_color(pdf_path, pages=50):
+    """get_dominant_color on the watermark rectangle of the first pages."""
+    import fitz  # PyMuPDF
+    from document_processor import _page_rect, get_dominant_color
+    from region_presets import normalized_region
+
+    region = normalized_region('notebooklm', 'pdf')
+    with fitz.open(pdf_path) as doc:
+        pages = min(pages, len(doc))
+        start = time.perf_counter()
+        for i in range(pages):
+            page = doc[i]
+            get_dominant_color(page, _page_rect(page, region))
+        elapsed = time.perf_counter() - start
+    return {'metrics': {'pages_per_sec': round(pages / elapsed, 1), 'ms_per_page': round(elapsed * 1e3 / pages, 3)}}
+
+
+def bench_remove_pdf(pdf_path, output_path, workers=1, mode='redact'):
+    """remove_watermark_from_pdf with automatic fill color."""
+    from api import remove_pdf_watermark
+    from metrics import JobMetrics
+
+    metrics = JobMetrics('pdf')
+    start = time.perf_counter()
+    success, message = remove_pdf_watermark(pdf_path, output_path, workers=workers, mode=mode, metrics=metrics)
+    wall = time.perf_counter() - start
+    if not success:
+        raise RuntimeError(message)
+    pages = metrics.counters['pages']
+    return {
+        'metrics': {'pages_per_sec': round(pages / wall, 1), 'wall_s': round(wall, 3), 'pages': pages,
+                    'output_mb': round(metrics.counters['bytes_written'] / 2**20, 2)},
+        'stages': metrics.to_dict()['stages'],
+    }
+
+
+def _run_case(fn, kwargs):
+    result = fn(**kwargs)
+    result['metrics']['peak_rss_mb'] = _peak_rss_mb()
+    return result
+
+
+def build_cases(fixtures, work_dir, engines=('moviepy', 'pipe', 'roi')):
+    """(name, function, kwargs) of every benchmark case."""
+    from encoder_profiles import PROFILES
+
+    cases = []
+    for size, path in fixtures['video'].items():
+        cases.append(('inpaint_frame/%s' % size, bench_inpaint_frame, {'video_path': path}))
+        for engine in engines:
+            output = os.path.join(work_dir, 'out_%s_%s.mp4' % (size, engine))
+            cases.append(('process_video/%s/%s' % (engine, size), bench_process_video,
+                          {'video_path': path, 'output_path': output, 'engine': engine}))
+        # Encoding cost and output size per profile; the pipe engine re-encodes every frame
+        for profile in sorted(PROFILES):
+            output = os.path.join(work_dir, 'out_%s_%s.mp4' % (size, profile))
+            cases.append(('encoder_profile/%s/%s' % (profile, size), bench_process_video,
+                          {'video_path': path, 'output_path': output, 'engine': 'pipe',
+                           'encoder_profile': profile}))
+    cases.append(('dominant_color', bench_dominant_color, {'pdf_path': fixtures['pdf']}))
+    for workers in (1, 2):
+        output = os.path.join(work_dir, 'out_%d.pdf' % workers)
+        cases.append(('remove_pdf/workers=%d' % workers, bench_remove_pdf,
+                      {'pdf_path': fixtures['pdf'], 'output_path': output, 'workers': workers}))
+    cases.append(('remove_pdf/objects', bench_remove_pdf,
+                  {'pdf_path': fixtures['pdf'], 'output_path': os.path.join(work_dir, 'out_objects.pdf'),
+                   'mode': 'objects'}))
+    return cases
+
+
+def _environment():
+    import cv2
+    import fitz  # PyMuPDF
+    import moviepy
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'pymupdf': fitz.VersionBind,
+        'moviepy': moviepy.__version__,
+    }
+
+
+def run(cases, only=None, log=print):
+    """Run the cases (those whose name starts with `only`) and return the results document."""
+    results = {}
+    # Processes forked from an exec'd parent inherit its peak RSS; the fork
+    # server is a fresh, small interpreter, so each case measures its own
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    for name, fn, kwargs in cases:
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                results[name] = pool.submit(_run_case, fn, kwargs).result()
+            except Exception as e:
+                results[name] = {'error': str(e)}
+        log('%-32s %s' % (name, results[name].get('metrics', results[name])))
+    return {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'environment': _environment(), 'results': results}
+
+
+def compare(baseline, current, threshold=0.15, only=None):
+    """
+    Metric changes between two results documents.
+    Returns a list of (case, metric, baseline, current, change, regressed)
+    where change is the relative change in the metric's own direction
+    (negative is worse).
+    A baseline case that failed in the current run is a regression with
+    metric 'error' and the error message as current; one missing from the
+    current run is a regression with metric 'missing'. Both have None for
+    baseline and change.
+    only: Case name prefixes the current run was limited to; baseline cases
+          outside them are not counted as missing.
+    """
+    rows = []
+    for name, base in baseline['results'].items():
+        if 'metrics' not in base or name in current['results']:
+            continue
+        if not only or any(name.startswith(prefix) for prefix in only):
+            rows.append((name, 'missing', None, None, None, True))
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base or 'metrics' not in base:
+            continue
+        if 'metrics' not in result:
+            rows.append((name, 'error', None, result.get('error'), None, True))
+            continue
+        for metric, value in result['metrics'].items():
+            old = base['metrics'].get(metric)
+            if metric in NOT_COMPARED or not old or not isinstance(value, (int, float)):
+                continue
+            change = (value - old) / old
+            if metric not in HIGHER_IS_BETTER:
+                change = -change
+            rows.append((name, metric, old, value, change, change < -threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description=__doc__.split('\n')[1])
+    parser.add_argument('results', nargs='?', help='Compare this results file instead of running')
+    parser.add_argument('-o', '--output', help='Write the results JSON here')
+    parser.add_argument('--compare', metavar='BASELINE', help='Baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='Relative change counted as a regression (default: 0.15)')
+    parser.add_argument('--fixtures', default=os.path.join('benchmarks', '.fixtures'),
+                        help='Fixture cache directory (default: benchmarks/.fixtures)')
+    parser.add_argument('--sizes', default='720p,1080p,4k', help='Video sizes (default: 720p,1080p,4k)')
+    parser.add_argument('--seconds', type=int, default=6, help='Length of the video fixtures (default: 6)')
+    parser.add_argument('--pages', type=int, default=300, help='Pages of the PDF fixture (default: 300)')
+    parser.add_argument('--quick', action='store_true', help='720p video and a 100-page PDF only')
+    parser.add_argument('--only', action='append', help='Run only cases whose name starts with this (repeatable)')
+    args = parser.parse_args(argv)
+
+    if args.results:
+        with open(args.results) as f:
+            current = json.load(f)
+    else:
+        sizes = ['720p'] if args.quick else args.sizes.split(',')
+        pages = min(args.pages, 100) if args.quick else args.pages
+        fixtures = ensure_fixtures(args.fixtures, sizes, args.seconds, pages)
+        work_dir = os.path.join(args.fixtures, 'out')
+        os.makedirs(work_dir, exist_ok=True)
+        current = run(build_cases(fixtures, work_dir), args.only)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(current, f, indent=2)
+
+    if not args.compare:
+        return 0
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    rows = compare(baseline, current, args.threshold, args.only)
+    for name, metric, old, new, change, regressed in rows:
+        if change is None:
+            print('%-32s %-18s %s  REGRESSION' % (name, metric, new or ''))
+            continue
+        print('%-32s %-18s %10.3f -> %10.3f  %+6.1f%%%s' % (
+            name, metric, old, new, change * 100, '  REGRESSION' if regressed else ''))
+    regressions = sum(1 for row in rows if row[-1])
+    print('%d regression(s) over %.0f%%' % (regressions, args.threshold * 100))
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Remove watermarks from videos and PDFs without the web UI.
+
+The repo is not packaged, so no magic-remover command gets installed; run
+this script from the repository directory:
+
+    python cli.py exports/ -o out/ --workers 4
+    python cli.py "exports/**/*.mp4" -o out/ --preset notebooklm --engine pipe --backend auto
+"""
+import argparse
+import os
+import sys
+
+from api import STATE_FILE, process_directory
+from inpainting import BACKEND_NAMES
+from document_processor import PDF_MODES
+from encoder_profiles import DEFAULT_PROFILE, PROFILES
+from region_presets import REGION_PRESETS
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='python cli.py',
+        description='Remove watermarks from videos and PDFs in bulk.',
+    )
+    parser.add_argument('inputs', nargs='+', help='Input directories or glob patterns')
+    parser.add_argument('-o', '--output-dir', required=True, help='Directory for processed files')
+    parser.add_argument('--preset', default='notebooklm', choices=sorted(REGION_PRESETS) + ['auto'],
+                        help="Watermark region preset, or 'auto' to detect it in videos; PDFs then use the "
+                             "notebooklm preset (default: notebooklm)")
+    parser.add_argument('-j', '--workers', type=int, default=1, help='Files processed in parallel (default: 1)')
+    parser.add_argument('--engine', default='moviepy', choices=['moviepy', 'pipe', 'roi'],
+                        help='Video processing engine (default: moviepy)')
+    parser.add_argument('--backend', default='telea', choices=BACKEND_NAMES,
+                        help="Video inpainting backend, or 'auto' to pick one per frame (default: telea)")
+    parser.add_argument('--encoder-profile', default=DEFAULT_PROFILE, choices=sorted(PROFILES),
+                        help='Video encoding profile (default: %s)' % DEFAULT_PROFILE)
+    parser.add_argument('--memory-budget', type=int, metavar='MB',
+                        help="Memory budget per video in MB for the job's own frame and mask buffers (the rest "
+                             "of the process and ffmpeg are not counted); runs the moviepy engine as roi and "
+                             "downscales or refuses videos that do not fit")
+    parser.add_argument('--page-workers', type=int, default=1,
+                        help='Worker processes splitting the pages of each PDF (default: 1)')
+    parser.add_argument('--pdf-mode', default='redact', choices=PDF_MODES,
+                        help="PDF removal: 'redact' covers the region, 'objects' deletes the text, drawings "
+                             "and images repeated inside it across pages without rendering (default: redact)")
+    parser.add_argument('--state', help='Resume state file (default: <output-dir>/%s)' % STATE_FILE)
+    parser.add_argument('--summary', help='JSON summary path (default: <output-dir>/summary.json)')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    summary_path = args.summary or os.path.join(args.output_dir, 'summary.json')
+
+    def report(record):
+        status = 'ok' if record['success'] else 'FAILED: %s' % record['message']
+        print('%s: %s' % (record['input'], status), flush=True)
+
+    summary = process_directory(
+        args.inputs, args.output_dir,
+        region=args.preset,
+        workers=args.workers,
+        state_path=args.state,
+        summary_path=summary_path,
+        progress_callback=report,
+        pdf_workers=args.page_workers,
+        pdf_mode=args.pdf_mode,
+        engine=args.engine,
+        backend=args.backend,
+        encoder_profile=args.encoder_profile,
+        memory_budget_mb=args.memory_budget,
+    )
+
+    print('%d processed, %d skipped, %d failed in %.1fs. Summary: %s' % (
+        summary['processed'], summary['skipped'], summary['failed'], summary['wall_time'], summary_path))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,133 +1,497 @@
 import fitz  # PyMuPDF
+import numpy as np
 from PIL import Image
-import io
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import threading
+import tempfile
+import shutil
+import time
+import math
+import os
 
-def get_pdf_preview(input_path, page_num=0):
+from hashing import FileDigests
+from metrics import JobMetrics, traced
+
+class PdfRenderCache:
     """
-    Render a page of the PDF to a PIL Image for preview.
-    Returns: (PIL.Image or None, error_message or None)
+    LRU cache of rendered PDF pages for previews, keyed by file hash and page.
+    Pages are kept as raw RGB arrays (no PNG encode/decode round trip) and the
+    documents they came from stay open, so re-rendering another page of a
+    recent file skips fitz.open.
+    max_bytes: Memory budget for the cached page arrays.
+    max_documents: Number of open fitz.Document handles kept.
+    """
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_documents=4):
+        self.max_bytes = max_bytes
+        self.max_documents = max_documents
+        self._pages = OrderedDict()  # (digest, page_num) -> array
+        self._documents = OrderedDict()  # digest -> fitz.Document
+        self._digests = FileDigests()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def render(self, path, page_num=0):
+        """
+        Rendered page as a read-only (h, w, 3) uint8 RGB array.
+        Raises IndexError if the page does not exist.
+        """
+        # Hash outside the lock: a large new upload must not stall other previews
+        digest = self._digests.sha256(path)
+        key = (digest, page_num)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+                return page
+
+            doc = self._document(digest, path)
+            if page_num >= len(doc):
+                raise IndexError(page_num)
+            pix = doc[page_num].get_pixmap(alpha=False)
+            page = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+            page = page[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+
+            self._pages[key] = page
+            self._bytes += page.nbytes
+            # Evict least recently used pages, but always keep the newest one
+            while self._bytes > self.max_bytes and len(self._pages) > 1:
+                _, evicted = self._pages.popitem(last=False)
+                self._bytes -= evicted.nbytes
+            return page
+
+    def page_count(self, path):
+        digest = self._digests.sha256(path)
+        with self._lock:
+            return len(self._document(digest, path))
+
+    def clear(self):
+        with self._lock:
+            for doc in self._documents.values():
+                doc.close()
+            self._documents.clear()
+            self._pages.clear()
+            self._digests.clear()
+            self._bytes = 0
+
+    def _document(self, digest, path):
+        doc = self._documents.get(digest)
+        if doc is not None:
+            self._documents.move_to_end(digest)
+            return doc
+        doc = self._documents[digest] = fitz.open(path)
+        while len(self._documents) > self.max_documents:
+            _, evicted = self._documents.popitem(last=False)
+            evicted.close()
+        return doc
+
+_render_cache = PdfRenderCache()
+
+def get_pdf_page_array(input_path, page_num=0):
+    """
+    Render a page of the PDF to an RGB numpy array (cached, read-only).
+    Returns: (np.ndarray or None, error_message or None)
     """
     try:
-        doc = fitz.open(input_path)
-        if len(doc) <= page_num:
-            return None, "페이지 번호가 범위를 벗어났습니다."
-        page = doc[page_num]
-        pix = page.get_pixmap()
-        img_data = pix.tobytes("png")
-        return Image.open(io.BytesIO(img_data)), None
+        return _render_cache.render(input_path, page_num), None
+    except IndexError:
+        return None, "페이지 번호가 범위를 벗어났습니다."
     except Exception as e:
         return None, f"PDF 미리보기 실패: {str(e)}"
 
-def get_dominant_color(page, rect):
+def get_pdf_preview(input_path, page_num=0):
+    """
+    Render a page of the PDF to a PIL Image for preview.
+    Returns: (PIL.Image or None, error_message or None)
+    """
+    page, error = get_pdf_page_array(input_path, page_num)
+    if page is None:
+        return None, error
+    return Image.fromarray(page), None
+
+def get_dominant_color(page, rect, quantize=0):
     """
     Get the dominant color of the area defined by rect on the page.
     Uses border pixels to avoid sampling the watermark text itself.
+    quantize: Low bits dropped per channel before counting (0 = exact colors).
+              2~3 keeps JPEG noise from splitting the most common color;
+              the result is then the mean color of the winning bucket.
     Returns RGB tuple (0~1).
     """
     try:
-        # Get pixmap of the rect at 1.0 (72 DPI) - high quality not needed for color
-        pix = page.get_pixmap(clip=rect)
-        width, height = pix.width, pix.height
-        
+        # Render the rect once at 1.0 (72 DPI) - high quality not needed for color
+        # Force RGB (no alpha)
+        pix = page.get_pixmap(clip=rect, alpha=False)
+        w, h, n = pix.width, pix.height, pix.n
+
         # If too small, just return white
-        if width < 5 or height < 5:
+        if w < 5 or h < 5:
             return (1, 1, 1)
 
-        # Access samples
-        # pix.samples is a bytes object or flat sequence
-        # We need to be careful about format (RGB vs RGBA). 
-        # By default get_pixmap() is RGB or RGBA depending on alpha.
-        # Force RGB
-        pix = page.get_pixmap(clip=rect, alpha=False)
-        samples = pix.samples
-        w = pix.width
-        h = pix.height
-        
-        # We want border pixels.
-        # Top row: samples[0 : w*3]
-        # Bottom row: samples[(h-1)*w*3 : ]
-        # Left/Right columns are strided.
-        
-        colors = []
-        
-        def add_pixel(idx):
-            r = samples[idx]
-            g = samples[idx+1]
-            b = samples[idx+2]
-            colors.append((r, g, b))
-
-        # Top & Bottom rows
-        for x in range(w):
-            # Top
-            add_pixel(x * 3)
-            # Bottom
-            add_pixel(((h - 1) * w + x) * 3)
-            
-        # Left & Right columns (skip corners to avoid duplication)
-        for y in range(1, h - 1):
-            # Left
-            add_pixel((y * w) * 3)
-            # Right
-            add_pixel((y * w + (w - 1)) * 3)
-            
-        if colors:
-            # Find most frequent color
-            from collections import Counter
-            most_common = Counter(colors).most_common(1)[0][0]
-            return (most_common[0]/255.0, most_common[1]/255.0, most_common[2]/255.0)
-            
+        # View the samples as an (h, w, n) array without copying.
+        # Rows may be padded, so go through the stride.
+        samples = getattr(pix, "samples_mv", None) or pix.samples
+        img = np.frombuffer(samples, dtype=np.uint8).reshape(h, pix.stride)[:, :w * n].reshape(h, w, n)
+
+        # Border ring: top & bottom rows, then left & right columns without the corners
+        ring = np.concatenate((img[0], img[-1], img[1:-1, 0], img[1:-1, -1]))[:, :3]
+
+        # Pack RGB into one uint32 per pixel and take the mode
+        q = ring >> quantize if quantize else ring
+        packed = (q[:, 0].astype(np.uint32) << 16) | (q[:, 1].astype(np.uint32) << 8) | q[:, 2]
+        values, inverse, counts = np.unique(packed, return_inverse=True, return_counts=True)
+        winner = counts.argmax()
+
+        if quantize:
+            color = ring[inverse.ravel() == winner].mean(axis=0)
+        else:
+            v = int(values[winner])
+            color = ((v >> 16) & 0xFF, (v >> 8) & 0xFF, v & 0xFF)
+        return (color[0]/255.0, color[1]/255.0, color[2]/255.0)
+
     except Exception:
         pass
     return (1, 1, 1) # Default white if failed
 
-def remove_watermark_from_pdf(input_path, output_path, rect=None, fill_color=(1, 1, 1)):
+def _page_rect(page, rect):
+    """Convert a normalized (x, y, w, h) rect to page coordinates."""
+    rx, ry, rw, rh = rect
+    width = page.rect.width
+    height = page.rect.height
+
+    # Calculate absolute coordinates
+    x0 = rx * width
+    y0 = ry * height
+    x1 = (rx + rw) * width
+    y1 = (ry + rh) * height
+
+    return fitz.Rect(x0, y0, x1, y1)
+
+def _redact_page(page, rect, fill_color):
+    """Cover the normalized rect on one page with a redaction."""
+    pdf_rect = _page_rect(page, rect)
+
+    # Determine Color
+    current_fill = fill_color
+    if fill_color == "auto":
+        current_fill = get_dominant_color(page, pdf_rect)
+
+    # Add Redaction Annotation
+    # fill argument expects (r, g, b) or None.
+    page.add_redact_annot(pdf_rect, fill=current_fill)
+
+    # Apply Redaction
+    # If current_fill is None (Transparent), we assume the user wants to keep the background image
+    if current_fill is None:
+        page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
+    else:
+        page.apply_redactions() # Default: removes everything (images included)
+
+# Share of an object's bounding box that must lie inside the watermark rect.
+# Text boxes include the font's ascent and descent, so they often stick out a little.
+INSIDE_RATIO = 0.6
+# Slack (points) for objects without area, such as straight lines
+CONTAIN_TOLERANCE = 1.0
+
+def _inside(bbox, rect):
+    """True if (most of) bbox lies inside rect."""
+    area = bbox.get_area()
+    if area <= 0:
+        return (bbox.x0 >= rect.x0 - CONTAIN_TOLERANCE and bbox.y0 >= rect.y0 - CONTAIN_TOLERANCE and
+                bbox.x1 <= rect.x1 + CONTAIN_TOLERANCE and bbox.y1 <= rect.y1 + CONTAIN_TOLERANCE)
+    return fitz.Rect(bbox).intersect(rect).get_area() >= INSIDE_RATIO * area
+
+def _page_drawings(page, pdf_rect):
+    """Vector paths (mostly) inside pdf_rect, grown by their stroke width."""
+    drawings = []
+    for drawing in page.get_drawings():
+        if _inside(drawing['rect'], pdf_rect):
+            grow = (drawing.get('width') or 0) + CONTAIN_TOLERANCE
+            drawings.append(drawing['rect'] + (-grow, -grow, grow, grow))
+    return drawings
+
+class _PageObjects:
+    """
+    Content objects of one page lying (mostly) inside the watermark rect.
+    spans: [(text, fitz.Rect)] text spans.
+    drawings: [fitz.Rect] vector paths, grown by their stroke width so that a
+              redaction of the rect covers the whole path.
+    images: {xref} placed images (inline images have no xref and are not listed).
+    outside: {xref} images placed at least partly outside the rect.
+    """
+    def __init__(self, page, pdf_rect):
+        # Extract around the rect so spans crossing its border come out whole,
+        # instead of being clipped into it
+        margin = max(pdf_rect.width, pdf_rect.height)
+        clip = fitz.Rect(pdf_rect.x0 - margin, pdf_rect.y0 - margin, pdf_rect.x1 + margin, pdf_rect.y1 + margin)
+        self.spans = []
+        for block in page.get_text('dict', clip=clip)['blocks']:
+            for line in block.get('lines', ()):
+                for span in line['spans']:
+                    bbox = fitz.Rect(span['bbox'])
+                    if span['text'].strip() and _inside(bbox, pdf_rect):
+                        self.spans.append((span['text'].strip(), bbox))
+
+        self.drawings = _page_drawings(page, pdf_rect)
+
+        # Placements come without xrefs: looking them up (get_image_info(xrefs=True))
+        # decodes and hashes every image on the page, so match by pixel size instead.
+        # A placement matching several xrefs counts against all of them.
+        by_size = {}
+        for item in page.get_images(full=True):
+            by_size.setdefault((item[2], item[3]), set()).add(item[0])
+        self.images = set()
+        self.outside = set()
+        for info in page.get_image_info():
+            xrefs = by_size.get((info['width'], info['height']), set())
+            if len(xrefs) == 1 and _inside(fitz.Rect(info['bbox']), pdf_rect):
+                self.images |= xrefs
+            else:
+                self.outside |= xrefs
+
+    def __bool__(self):
+        return bool(self.spans or self.drawings or self.images)
+
+# Share of the pages an object must be found on, inside the rect, to count
+# as the watermark (at least 2 pages, or every page of shorter documents)
+REPEAT_RATIO = 0.5
+
+def _drawing_key(bbox):
+    """Position of a vector path, rounded so the same path matches across pages."""
+    return tuple(int(round(v)) for v in bbox)
+
+def _remove_objects(doc, rect, fill_color, metrics):
+    """
+    Remove the watermark objects inside the normalized rect from every page,
+    without rendering. The watermark is what repeats: text, vector drawings
+    (by position) and images (by xref) found inside the rect on at least
+    REPEAT_RATIO of the pages. Text unique to a page, such as a page number,
+    is left alone.
+    - repeated text spans and drawings are redacted with no fill and images
+      kept, so the page background shows through;
+    - repeated images placed only inside the rect are replaced once per
+      xref, which removes a watermark XObject shared by all pages in a
+      single step and leaves one tiny image in the file.
+    Images also placed outside the rect on some page are kept. Pages with no
+    object inside the rect (e.g. a watermark baked into the page image) fall
+    back to the redaction rectangle with fill_color.
+    Returns a one-line summary of what was removed.
+    """
+    metrics.switch('scan')
+    pages = [(page, _page_rect(page, rect)) for page in doc]
+    found = [_PageObjects(page, pdf_rect) for page, pdf_rect in pages]
+    outside = set().union(*(objects.outside for objects in found))
+
+    # Pages each text, drawing position and image is found on
+    texts, drawings, images = {}, {}, {}
+    for objects in found:
+        for text in set(text for text, _ in objects.spans):
+            texts[text] = texts.get(text, 0) + 1
+        for key in set(_drawing_key(bbox) for bbox in objects.drawings):
+            drawings[key] = drawings.get(key, 0) + 1
+        for xref in objects.images:
+            images[xref] = images.get(xref, 0) + 1
+    min_pages = min(len(found), max(2, math.ceil(REPEAT_RATIO * len(found))))
+
+    metrics.switch('redact')
+    removed_texts = {}
+    removed_images = set()
+    spans = paths = kept = fallback = 0
+    for (page, pdf_rect), objects in zip(pages, found):
+        if not objects:
+            _redact_page(page, rect, fill_color)
+            fallback += 1
+            continue
+        page_spans = [(text, bbox) for text, bbox in objects.spans if texts[text] >= min_pages]
+        page_paths = [bbox for bbox in objects.drawings if drawings[_drawing_key(bbox)] >= min_pages]
+        page_images = set(xref for xref in objects.images if images[xref] >= min_pages) - outside
+        kept += len(objects.spans) - len(page_spans) + len(objects.drawings) - len(page_paths)
+        for text, bbox in page_spans:
+            page.add_redact_annot(bbox, fill=None)
+        for bbox in page_paths:
+            page.add_redact_annot(bbox, fill=None)
+        if page_spans or page_paths:
+            # Only paths the annotations cover go; the default (remove if touched,
+            # from PyMuPDF 1.24.2) would also drop backgrounds and bars under the rect
+            page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE,
+                                  graphics=fitz.PDF_REDACT_LINE_ART_REMOVE_IF_COVERED)
+        for xref in page_images - removed_images:
+            page.delete_image(xref)
+            removed_images.add(xref)
+        for text in set(text for text, _ in page_spans):
+            removed_texts[text] = removed_texts.get(text, 0) + 1
+        spans += len(page_spans)
+        if page_paths:
+            # Count the selected paths that are really gone, not the annotations
+            left = {}
+            for bbox in _page_drawings(page, pdf_rect):
+                left[_drawing_key(bbox)] = left.get(_drawing_key(bbox), 0) + 1
+            selected = {}
+            for bbox in page_paths:
+                selected[_drawing_key(bbox)] = selected.get(_drawing_key(bbox), 0) + 1
+            paths += sum(max(0, n - left.get(key, 0)) for key, n in selected.items())
+
+    summary = f"텍스트 {spans}개, 도형 {paths}개, 이미지 {len(removed_images)}개"
+    if removed_texts:
+        text, pages_with_text = max(removed_texts.items(), key=lambda item: item[1])
+        if pages_with_text > 1:
+            summary += f", 공통 문구 '{text}' {pages_with_text}쪽"
+    if kept:
+        summary += f", 반복되지 않아 남긴 개체 {kept}개"
+    if fallback:
+        summary += f", 개체가 없어 영역 덮기 {fallback}쪽"
+    return summary
+
+def _process_page_range(input_path, part_path, start, end, rect, fill_color):
+    """
+    Redact pages [start, end) in a separately opened copy of the document and
+    save just those pages to part_path. Runs inside a worker process.
+    """
+    doc = fitz.open(input_path)
+    try:
+        for page_num in range(start, end):
+            _redact_page(doc[page_num], rect, fill_color)
+        doc.select(list(range(start, end)))
+        doc.save(part_path)
+    finally:
+        doc.close()
+    return part_path
+
+def _restore_cross_links(original, merged, bounds):
+    """
+    Copy the links of the original pointing from one part's pages into
+    another's: insert_pdf only keeps links whose target is in the same part.
+    bounds: Page ranges of the parts, as in _process_pages_parallel.
+    """
+    for start, end in zip(bounds, bounds[1:]):
+        for page_num in range(start, end):
+            for link in original[page_num].get_links():
+                target = link.get('page', -1)
+                if link['kind'] not in (fitz.LINK_GOTO, fitz.LINK_NAMED) or target < 0 or start <= target < end:
+                    continue
+                merged[page_num].insert_link({'kind': fitz.LINK_GOTO, 'from': link['from'], 'page': target,
+                                              'to': link.get('to', fitz.Point(0, 0)), 'zoom': link.get('zoom', 0)})
+
+def _process_pages_parallel(input_path, rect, fill_color, page_count, workers, metrics=None):
+    """
+    Split the pages into contiguous ranges, redact each range in a process
+    pool and merge the parts back in order.
+    Document-level metadata, the outline, page labels and links between
+    pages of different parts are copied from the original. Each part keeps
+    its own copy of images shared across parts, so save the result with
+    garbage=4 to merge them again.
+    metrics: Optional JobMetrics; receives the 'redact' and 'merge' times.
+    Returns the merged fitz.Document (caller saves and closes it).
+    """
+    if metrics is None:
+        metrics = JobMetrics('pdf')
+    workers = min(workers, page_count)
+    bounds = [page_count * i // workers for i in range(workers + 1)]
+    work_dir = tempfile.mkdtemp()
+    try:
+        part_paths = [os.path.join(work_dir, "part_%04d.pdf" % i) for i in range(workers)]
+        metrics.switch('redact')
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_process_page_range, input_path, part_paths[i], bounds[i], bounds[i + 1], rect, fill_color)
+                for i in range(workers)
+            ]
+            for future in futures:
+                future.result()  # Re-raise worker errors
+
+        metrics.switch('merge')
+        merged = fitz.open()
+        for part_path in part_paths:
+            with fitz.open(part_path) as part:
+                merged.insert_pdf(part)
+
+        with fitz.open(input_path) as original:
+            merged.set_metadata(original.metadata)
+            toc = original.get_toc(simple=False)
+            if toc:
+                merged.set_toc(toc)
+            labels = original.get_page_labels()
+            if labels:
+                merged.set_page_labels(labels)
+            _restore_cross_links(original, merged, bounds)
+        metrics.switch(None)
+        return merged
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+PDF_MODES = ('redact', 'objects')
+
+@traced('pdf')
+def remove_watermark_from_pdf(input_path, output_path, rect=None, fill_color=(1, 1, 1), workers=1, garbage=None, deflate=True,
+                              metrics=None, mode='redact'):
     """
     Remove watermarks from PDF inside a rectangle.
     rect: tuple (x, y, w, h) normalized (0.0 to 1.0) relative to page size.
     fill_color: tuple (r, g, b) 0.0~1.0 OR string "auto". 
                 If "auto", detects color per page.
                 If None, leaves it transparent (shows page bg).
+    workers: Number of worker processes. 1 processes pages serially,
+             more splits the pages into ranges processed in parallel.
+             None uses all available cores.
+    garbage: Garbage collection level for saving (0~4, see fitz.Document.save).
+             None (default) uses 4 for parallel runs, which merges the copies
+             of shared images made by each page range, and 3 otherwise.
+    deflate: Compress uncompressed streams when saving.
+    metrics: Optional JobMetrics filled with per-stage times ('open',
+             'scan', 'redact', 'merge', 'save'), pages, output size and
+             peak memory.
+    mode: 'redact' (default) covers the rect with a redaction on every page.
+          'objects' removes the text, drawings and images repeated inside
+          the rect across pages instead (see _remove_objects): no page is rendered, shared
+          watermark images are removed once, and the background under the
+          watermark is kept. workers is ignored in this mode; it is fast
+          enough serially.
+    Returns (success, message).
     """
+    if metrics is None:
+        metrics = JobMetrics('pdf')
+    metrics.begin()
     try:
+        if mode not in PDF_MODES:
+            raise ValueError("Unknown PDF mode: %s" % mode)
+        start_time = time.time()
+        metrics.switch('open')
         doc = fitz.open(input_path)
+        page_count = len(doc)
         count = 0
-        
-        # We need to apply to all pages
-        for page in doc:
-            # Rectangle Removal
-            if rect:
-                # rect is normalized (0.0~1.0). Convert to page coordinates.
-                rx, ry, rw, rh = rect
-                width = page.rect.width
-                height = page.rect.height
-                
-                # Calculate absolute coordinates
-                x0 = rx * width
-                y0 = ry * height
-                x1 = (rx + rw) * width
-                y1 = (ry + rh) * height
-                
-                pdf_rect = fitz.Rect(x0, y0, x1, y1)
-                
-                # Determine Color
-                current_fill = fill_color
-                if fill_color == "auto":
-                    current_fill = get_dominant_color(page, pdf_rect)
-                
-                # Add Redaction Annotation
-                # fill argument expects (r, g, b) or None.
-                page.add_redact_annot(pdf_rect, fill=current_fill)
-                
-                # Apply Redaction
-                # If current_fill is None (Transparent), we assume the user wants to keep the background image
-                if current_fill is None:
-                    page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE)
-                else:
-                    page.apply_redactions() # Default: removes everything (images included)
-                
-                count += 1
-
-        doc.save(output_path)
-        return True, f"처리가 완료되었습니다. (총 {count} 페이지 처리)"
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        summary = None
+        if rect and mode == 'objects':
+            summary = _remove_objects(doc, rect, fill_color, metrics)
+            count = page_count
+        elif rect and workers > 1 and page_count > 1:
+            doc.close()
+            doc = _process_pages_parallel(input_path, rect, fill_color, page_count, workers, metrics)
+            count = page_count
+            if garbage is None:
+                garbage = 4
+        else:
+            metrics.switch('redact')
+            # We need to apply to all pages
+            for page in doc:
+                # Rectangle Removal
+                if rect:
+                    _redact_page(page, rect, fill_color)
+                    count += 1
+
+        metrics.switch('save')
+        doc.save(output_path, garbage=3 if garbage is None else garbage, deflate=deflate)
+        doc.close()
+
+        elapsed = time.time() - start_time
+        rate = count / elapsed if elapsed > 0 else 0.0
+        metrics.count('pages', count)
+        message = f"처리가 완료되었습니다. (총 {count} 페이지 처리, {rate:.1f} 페이지/초)"
+        if summary:
+            message += f"\n제거한 개체: {summary}"
+        return metrics.finish(True, message, output_path)
     except Exception as e:
-        return False, str(e)
+        return metrics.finish(False, str(e))
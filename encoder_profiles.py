@@ -0,0 +1,88 @@
+"""
+Named H.264 encoding profiles for the video engines.
+
+    fast-preview  ultrafast preset at 2000 kb/s: the original settings,
+                  quick to produce and to upload, visibly soft on detail.
+    balanced      veryfast preset at CRF 23: near-transparent for slides at
+                  a fraction of the preview's size.
+    archival-crf  slow preset at CRF 18: for keeping; slowest to encode.
+
+Thread counts follow the cores available to the process, split between
+concurrent encoders.
+"""
+import os
+
+DEFAULT_PROFILE = 'fast-preview'
+
+
+class EncoderProfile:
+    """
+    libx264 settings. Exactly one of crf (constant quality) and bitrate
+    (average rate, e.g. '2000k') is set.
+    """
+    def __init__(self, name, preset, crf=None, bitrate=None):
+        self.name = name
+        self.preset = preset
+        self.crf = crf
+        self.bitrate = bitrate
+
+    def rate_args(self):
+        """ffmpeg arguments selecting CRF or bitrate mode."""
+        if self.crf is not None:
+            return ['-crf', str(self.crf)]
+        return ['-b:v', self.bitrate]
+
+    def ffmpeg_args(self, threads):
+        """Output arguments for an ffmpeg command line."""
+        return (['-c:v', 'libx264', '-preset', self.preset] + self.rate_args() +
+                ['-threads', str(threads), '-pix_fmt', 'yuv420p'])
+
+    def writer_kwargs(self, threads):
+        """Keyword arguments for moviepy's write_videofile / FFMPEG_VideoWriter."""
+        return {
+            'codec': 'libx264',
+            'preset': self.preset,
+            'bitrate': self.bitrate,
+            'threads': threads,
+            'ffmpeg_params': ['-crf', str(self.crf)] if self.crf is not None else None,
+        }
+
+
+PROFILES = {
+    'fast-preview': EncoderProfile('fast-preview', 'ultrafast', bitrate='2000k'),
+    'balanced': EncoderProfile('balanced', 'veryfast', crf=23),
+    'archival-crf': EncoderProfile('archival-crf', 'slow', crf=18),
+}
+
+
+def get_profile(name=None):
+    """Profile by name (None for the default); EncoderProfile instances pass through."""
+    if isinstance(name, EncoderProfile):
+        return name
+    name = name or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError("Unknown encoder profile: %s" % name)
+    return PROFILES[name]
+
+
+def available_cores():
+    """CPU cores this process may run on (respects affinity/container limits)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # Not available on macOS/Windows
+        return os.cpu_count() or 1
+
+
+def encoder_threads(encoders=1):
+    """Threads for each of `encoders` encoders running at the same time."""
+    return max(1, available_cores() // max(1, encoders))
+
+
+def audio_args(source_codec):
+    """
+    ffmpeg audio arguments for an MP4 output: AAC sources are stream-copied,
+    anything else is encoded to AAC.
+    """
+    if source_codec == 'aac':
+        return ['-c:a', 'copy']
+    return ['-c:a', 'aac']
@@ -0,0 +1,57 @@
+import hashlib
+import os
+import threading
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """
+    SHA-256 hex digest of a file, read in chunks so large videos are never
+    loaded into memory at once.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def quick_fingerprint(path, sample_size=64 * 1024):
+    """
+    Cheap fingerprint from the file size and its first and last sample_size
+    bytes. Different fingerprints mean different files; equal ones still
+    need file_sha256 to confirm.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode('ascii'))
+    with open(path, 'rb') as f:
+        digest.update(f.read(sample_size))
+        if size > sample_size:
+            f.seek(max(sample_size, size - sample_size))
+            digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+class FileDigests:
+    """
+    file_sha256 memoized per file version: each (path, size, mtime) is
+    hashed once, and size and mtime catch in-place edits. Thread-safe; the
+    hashing itself runs outside the lock.
+    """
+    def __init__(self):
+        self._digests = {}  # (path, size, mtime) -> sha256
+        self._lock = threading.Lock()
+
+    def sha256(self, path):
+        st = os.stat(path)
+        version = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(version)
+        if digest is None:
+            digest = file_sha256(path)
+            with self._lock:
+                self._digests[version] = digest
+        return digest
+
+    def clear(self):
+        with self._lock:
+            self._digests.clear()
@@ -0,0 +1,221 @@
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from processor import process_video_with_mask
+from document_processor import remove_watermark_from_pdf
+from metrics import JobMetrics
+
+
+def _pdf_job(input_path, output_path, kwargs):
+    """Run remove_watermark_from_pdf in a worker process. Returns JobMetrics.to_dict()."""
+    metrics = JobMetrics('pdf')
+    remove_watermark_from_pdf(input_path, output_path, metrics=metrics, **kwargs)
+    return metrics.to_dict()
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while its pool is at capacity."""
+    pass
+
+
+class JobCancelled(Exception):
+    """Raised from a cancelled job's progress callback to stop the processing."""
+    pass
+
+
+class Job:
+    """
+    A submitted video or PDF job.
+    status: 'queued', 'running', 'done', 'failed' or 'cancelled'.
+    progress: float (0.0 to 1.0), updated through the progress callback.
+    result: (success, message) tuple once finished.
+    metrics: JobMetrics filled while the job runs.
+    started: time.time() when the job started running, or None.
+    """
+    def __init__(self, kind, input_path, output_path):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.input_path = input_path
+        self.output_path = output_path
+        self.status = 'queued'
+        self.progress = 0.0
+        self.result = None
+        self.metrics = JobMetrics(kind)
+        self.started = None
+        self._done = threading.Event()
+        self._cancel = threading.Event()
+
+    def update_progress(self, p):
+        # Raising here unwinds the processing loop, which stops its ffmpeg processes
+        if self._cancel.is_set():
+            raise JobCancelled("Cancelled")
+        self.progress = p
+
+    def cancel(self):
+        """
+        Ask the job to stop. A queued job never starts; a running video job
+        stops at its next progress update. PDF jobs report no progress, so
+        a running one finishes.
+        """
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the job finishes. Returns True if it finished."""
+        return self._done.wait(timeout)
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+
+class JobRunner:
+    """
+    Runs video and PDF jobs in separate worker pools.
+    Video jobs are CPU and memory heavy, so their pool size caps how many
+    run at once; PDF jobs get their own pool and never wait behind videos.
+    PDF jobs run in worker processes: PyMuPDF is not thread-safe (preview
+    rendering uses it in the server's threads) and holds the GIL, so PDF
+    threads would give no parallelism. Each job's thread waits for its
+    process and merges the process's metrics into job.metrics.
+    video_workers: Max concurrent video jobs.
+    pdf_workers: Max concurrent PDF jobs (and PDF worker processes).
+    max_queued: Jobs allowed to wait per pool once all workers are busy.
+                Submitting beyond that raises QueueFullError.
+    registry: Optional MetricsRegistry that observes every finished job.
+    results: Optional ResultCache. Jobs submitted with result_params are
+             answered from it when the same input was already processed
+             with the same parameters (the job is returned finished, without
+             queueing), and successful outputs are stored in it.
+    """
+    def __init__(self, video_workers=1, pdf_workers=2, max_queued=8, registry=None, results=None):
+        self._pools = {
+            'video': ThreadPoolExecutor(max_workers=video_workers, thread_name_prefix='video-job'),
+            'pdf': ThreadPoolExecutor(max_workers=pdf_workers, thread_name_prefix='pdf-job'),
+        }
+        # Started from a fresh interpreter, not forked from the threaded server
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self._pdf_processes = ProcessPoolExecutor(max_workers=pdf_workers, mp_context=context)
+        self._capacity = {
+            'video': video_workers + max_queued,
+            'pdf': pdf_workers + max_queued,
+        }
+        self._active = {'video': 0, 'pdf': 0}
+        self._lock = threading.Lock()
+        self.registry = registry
+        self.results = results
+
+    def submit_video(self, input_path, output_path, mask_image, result_params=None, **kwargs):
+        """
+        Queue process_video_with_mask. Extra keyword arguments are passed through.
+        result_params: JSON-serializable description of everything that
+                       determines the output (region, engine, backend, encoder
+                       settings), used as the result cache key with the
+                       input's content hash. None skips the result cache.
+        Returns the Job.
+        """
+        def run(job):
+            return process_video_with_mask(input_path, output_path, mask_image,
+                                           progress_callback=job.update_progress, metrics=job.metrics, **kwargs)
+        return self._submit('video', input_path, output_path, run, result_params)
+
+    def submit_pdf(self, input_path, output_path, result_params=None, **kwargs):
+        """
+        Queue remove_watermark_from_pdf in a worker process. Extra keyword
+        arguments are passed through and must be picklable.
+        result_params: As for submit_video.
+        Returns the Job.
+        """
+        def run(job):
+            data = self._pdf_processes.submit(_pdf_job, input_path, output_path, kwargs).result()
+            return job.metrics.merge(data)
+        return self._submit('pdf', input_path, output_path, run, result_params)
+
+    def pending(self, kind):
+        """Number of accepted, unfinished jobs of the given kind."""
+        with self._lock:
+            return self._active[kind]
+
+    def shutdown(self, wait=True):
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait)
+        self._pdf_processes.shutdown(wait=wait)
+
+    def _submit(self, kind, input_path, output_path, fn, result_params=None):
+        if self.results is not None and result_params is not None:
+            job = self._reuse(kind, input_path, output_path, result_params)
+            if job is not None:
+                return job
+            fn = self._storing(fn, input_path, output_path, result_params)
+
+        with self._lock:
+            if self._active[kind] >= self._capacity[kind]:
+                raise QueueFullError(f"{kind} queue is full ({self._active[kind]} jobs pending)")
+            self._active[kind] += 1
+
+        job = Job(kind, input_path, output_path)
+        try:
+            self._pools[kind].submit(self._run, job, fn)
+        except Exception:
+            with self._lock:
+                self._active[kind] -= 1
+            raise
+        return job
+
+    def _reuse(self, kind, input_path, output_path, result_params):
+        """A finished Job holding the stored result, or None on a miss."""
+        job = Job(kind, input_path, output_path)
+        with job.metrics.stage('result_cache'):
+            hit = self.results.fetch(input_path, result_params, output_path)
+        if not hit:
+            return None
+        job.metrics.count('result_hits')
+        job.result = job.metrics.finish(True, "Reused the stored result of an identical request", output_path)
+        job.status = 'done'
+        job.progress = 1.0
+        if self.registry is not None:
+            self.registry.observe(job.metrics, job.status)
+        job._done.set()
+        return job
+
+    def _storing(self, fn, input_path, output_path, result_params):
+        """Wrap fn so that a successful output is added to the result cache."""
+        def run(job):
+            result = fn(job)
+            if result[0]:
+                with job.metrics.stage('result_cache'):
+                    try:
+                        self.results.store(input_path, result_params, output_path)
+                    except OSError:
+                        pass  # The cache is best effort; the job's own output is fine
+            return result
+        return run
+
+    def _run(self, job, fn):
+        job.status = 'running'
+        job.started = time.time()
+        try:
+            if job.cancelled:
+                raise JobCancelled("Cancelled")
+            job.result = fn(job)
+        except Exception as e:
+            job.result = job.metrics.finish(False, str(e))
+        finally:
+            if job.result and job.result[0]:
+                job.status = 'done'
+            else:
+                job.status = 'cancelled' if job.cancelled else 'failed'
+            if job.status == 'done':
+                job.progress = 1.0
+            if self.registry is not None:
+                self.registry.observe(job.metrics, job.status)
+            with self._lock:
+                self._active[job.kind] -= 1
+            job._done.set()
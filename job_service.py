@@ -0,0 +1,137 @@
+"""
+Asyncio front end of JobRunner for servers handling many users at once.
+
+Submitting returns a job ID right away; the processing itself runs in
+JobRunner's thread pools, so no event loop or server worker is held for
+the length of a job. Progress is read as events from an async generator:
+
+    service = JobService(runner)
+    job_id = await service.submit_video("talk.mp4", "talk_fixed.mp4", plan, engine="roi")
+    async for event in service.events(job_id):
+        print(event["status"], event["stage"], event["percent"], event["fps"], event["eta"])
+
+cancel(job_id) stops a running video job at its next frame: its ffmpeg
+processes are killed and its worker is freed for the next job.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from functools import partial
+
+import cv2
+
+FINISHED = ('done', 'failed', 'cancelled')
+
+
+def _count_frames(input_path):
+    """Frame count from the container header (0 if unknown)."""
+    cap = cv2.VideoCapture(input_path)
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return max(frames, 0)
+
+
+class JobService:
+    """
+    runner: JobRunner doing the work.
+    interval: Seconds between progress events.
+    keep: Finished jobs kept for lookup by ID; the oldest are forgotten first.
+    """
+    def __init__(self, runner, interval=0.5, keep=256):
+        self.runner = runner
+        self.interval = interval
+        self.keep = keep
+        self._jobs = OrderedDict()  # job ID -> (Job, frame count or None)
+
+    async def submit_video(self, input_path, output_path, mask_image, **kwargs):
+        """
+        Queue a video job (arguments as for JobRunner.submit_video).
+        Returns the job ID without waiting for the job; raises QueueFullError.
+        """
+        return await self._submit(partial(self.runner.submit_video, input_path, output_path, mask_image, **kwargs))
+
+    async def submit_pdf(self, input_path, output_path, **kwargs):
+        """As submit_video, for JobRunner.submit_pdf."""
+        return await self._submit(partial(self.runner.submit_pdf, input_path, output_path, **kwargs))
+
+    async def track(self, job):
+        """Register a Job submitted to the runner directly. Returns its ID."""
+        frames = None
+        if job.kind == 'video':
+            frames = await asyncio.get_running_loop().run_in_executor(None, _count_frames, job.input_path)
+        self._jobs[job.id] = (job, frames)
+        self._forget()
+        return job.id
+
+    def get(self, job_id):
+        """The Job with this ID (KeyError if unknown or forgotten)."""
+        return self._jobs[job_id][0]
+
+    def cancel(self, job_id):
+        """Cancel the job. Returns False if it had already finished."""
+        job = self.get(job_id)
+        if job.done:
+            return False
+        job.cancel()
+        return True
+
+    def event(self, job_id):
+        """
+        Snapshot of the job's state:
+        id, kind, status, stage (running stage, or the status while not
+        running), percent (0-100), fps (video frames per second since the
+        job started, None for PDFs), eta (seconds, None while unknown),
+        message (set once finished) and output (path once done).
+        """
+        job, frames = self._jobs[job_id]
+        status = job.status
+        progress = job.progress
+        elapsed = time.time() - job.started if job.started is not None else 0.0
+
+        stage = status
+        fps = eta = None
+        if status == 'running':
+            stage = job.metrics.current_stage or 'processing'
+            if frames and elapsed > 0:
+                fps = round(frames * progress / elapsed, 1)
+            if 0 < progress < 1:
+                eta = round(elapsed * (1 - progress) / progress, 1)
+        return {
+            'id': job.id,
+            'kind': job.kind,
+            'status': status,
+            'stage': stage,
+            'percent': round(progress * 100, 1),
+            'fps': fps,
+            'eta': eta,
+            'message': job.result[1] if job.result else None,
+            'output': job.output_path if status == 'done' else None,
+        }
+
+    async def events(self, job_id):
+        """
+        Yield an event (see event()) every interval until the job finishes;
+        the last event is the finished state.
+        """
+        while True:
+            event = self.event(job_id)
+            yield event
+            if event['status'] in FINISHED:
+                return
+            await asyncio.sleep(self.interval)
+
+    async def wait(self, job_id):
+        """Wait for the job to finish. Returns its (success, message) result."""
+        async for _ in self.events(job_id):
+            pass
+        return self.get(job_id).result
+
+    async def _submit(self, submit):
+        # Submitting may hash the input for the result cache; keep that off the event loop
+        job = await asyncio.get_running_loop().run_in_executor(None, submit)
+        return await self.track(job)
+
+    def _forget(self):
+        finished = [job_id for job_id, (job, _) in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job_id]
@@ -0,0 +1,301 @@
+"""
+Lightweight per-job instrumentation.
+
+A JobMetrics object is passed to process_video_with_mask or
+remove_watermark_from_pdf (metrics=...) and filled while the job runs:
+cumulative time per stage, frames/pages, cache hits, bytes written and
+peak memory. MetricsRegistry aggregates finished jobs and renders them in
+the Prometheus text format; serve_metrics exposes that over HTTP.
+
+Setting MAGIC_REMOVER_PROFILE to a directory makes every traced job write
+a cProfile dump there (open with snakeviz or `python -m pstats`). Pipeline
+threads are named after their stage, so py-spy dumps read the same way.
+"""
+import cProfile
+import itertools
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+PROFILE_ENV = 'MAGIC_REMOVER_PROFILE'
+_profile_ids = itertools.count(1)
+
+COUNTERS = ('frames', 'pages', 'cache_hits', 'cache_misses', 'bytes_written', 'result_hits')
+
+# Seconds between resident memory samples of a running job
+RSS_SAMPLE_INTERVAL = 0.2
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def current_rss_mb():
+    """Resident set size of this process right now in MB (the peak, or 0.0, where unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):  # Not Linux
+        return peak_rss_mb() or 0.0
+
+
+class JobMetrics:
+    """
+    Structured result of one job, next to its (success, message) tuple.
+    stages: {stage: cumulative seconds}. Stages of a pipeline overlap in
+            time (decode, inpaint and encode run concurrently), so they do
+            not add up to wall_time.
+    counters: frames, pages, cache_hits, cache_misses, bytes_written,
+              result_hits (1 when the result cache answered the job).
+    backends: Per-backend inpainting latency (see BackendStats.summary).
+    peak_rss_mb: Highest resident memory of the process sampled between
+                 begin() and finish(), and rss_growth_mb that peak minus the
+                 memory in use at begin(). In a server running several jobs
+                 at once both include the other jobs' memory; the ffmpeg
+                 subprocesses are not counted.
+    Stage timers may be used from several threads at once.
+    """
+    def __init__(self, kind='video'):
+        self.kind = kind
+        self.stages = {}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.backends = {}
+        self.success = None
+        self.message = None
+        self.wall_time = None
+        self.peak_rss_mb = None
+        self.rss_growth_mb = None
+        self._rss_start = None
+        self._rss_stop = None
+        self._started = time.perf_counter()
+        self._current = None  # (stage, start) of the running switch() stage
+        self._open = []  # Names of the stage() blocks currently running, innermost last
+        self._lock = threading.Lock()
+
+    def begin(self):
+        """Record the memory in use as the job starts and sample it until finish()."""
+        self._rss_start = self.peak_rss_mb = current_rss_mb()
+        self._rss_stop = threading.Event()
+        threading.Thread(target=self._sample_rss, args=(self._rss_stop,), name='metrics-rss', daemon=True).start()
+
+    def sample_rss(self):
+        """Take a memory sample now. Returns the job's peak so far in MB."""
+        rss = current_rss_mb()
+        with self._lock:
+            if self.peak_rss_mb is None or rss > self.peak_rss_mb:
+                self.peak_rss_mb = rss
+            return self.peak_rss_mb
+
+    def _sample_rss(self, stop):
+        while not stop.wait(RSS_SAMPLE_INTERVAL):
+            self.sample_rss()
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as part of stage name."""
+        start = time.perf_counter()
+        with self._lock:
+            self._open.append(name)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._open.remove(name)
+            self.add_time(name, time.perf_counter() - start)
+
+    def switch(self, name):
+        """End the running sequential stage and start name (None just ends it)."""
+        now = time.perf_counter()
+        if self._current is not None:
+            stage, start = self._current
+            self.add_time(stage, now - start)
+        self._current = (name, now) if name is not None else None
+
+    @property
+    def current_stage(self):
+        """The stage running right now (the latest stage() block, else the switch() stage), or None."""
+        with self._lock:
+            if self._open:
+                return self._open[-1]
+        current = self._current
+        return current[0] if current is not None else None
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def finish(self, success, message, output_path=None):
+        """Close the running stage and record the outcome, output size and peak memory."""
+        self.switch(None)
+        if self._rss_stop is not None:
+            self._rss_stop.set()
+        self.success = success
+        self.message = message
+        self.wall_time = time.perf_counter() - self._started
+        if success and output_path and os.path.exists(output_path):
+            self.counters['bytes_written'] = os.path.getsize(output_path)
+        self.sample_rss()
+        if self._rss_start is not None:
+            self.rss_growth_mb = self.peak_rss_mb - self._rss_start
+        return success, message
+
+    def merge(self, data):
+        """
+        Take over the outcome of the same job measured in another process
+        (a to_dict() result): stage times and counters are added, the rest
+        replaced. Memory is then the worker process's own.
+        """
+        with self._lock:
+            for stage, seconds in data['stages'].items():
+                self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+            for name, value in data['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            self.backends = data['backends']
+            self.success = data['success']
+            self.message = data['message']
+            self.wall_time = data['wall_time']
+            self.peak_rss_mb = data['peak_rss_mb']
+            self.rss_growth_mb = data['rss_growth_mb']
+        return self.success, self.message
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'success': self.success,
+            'message': self.message,
+            'wall_time': round(self.wall_time, 3) if self.wall_time is not None else None,
+            'stages': {name: round(seconds, 3) for name, seconds in self.stages.items()},
+            'counters': dict(self.counters),
+            'backends': self.backends,
+            'peak_rss_mb': round(self.peak_rss_mb, 1) if self.peak_rss_mb is not None else None,
+            'rss_growth_mb': round(self.rss_growth_mb, 1) if self.rss_growth_mb is not None else None,
+        }
+
+
+class MetricsRegistry:
+    """Totals over finished jobs, rendered in the Prometheus text format."""
+    def __init__(self, prefix='magic_remover'):
+        self.prefix = prefix
+        self._jobs = {}  # (kind, status) -> count
+        self._stages = {}  # (kind, stage) -> seconds
+        self._counters = {}  # (kind, counter) -> total
+        self._lock = threading.Lock()
+
+    def observe(self, metrics, status=None):
+        """
+        Add a finished job. status: the job's final status ('done', 'failed',
+        'cancelled'); defaults to done or failed from metrics.success.
+        """
+        status = status or ('done' if metrics.success else 'failed')
+        with self._lock:
+            key = (metrics.kind, status)
+            self._jobs[key] = self._jobs.get(key, 0) + 1
+            for stage, seconds in metrics.stages.items():
+                key = (metrics.kind, stage)
+                self._stages[key] = self._stages.get(key, 0.0) + seconds
+            for name, value in metrics.counters.items():
+                key = (metrics.kind, name)
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def to_prometheus(self):
+        p = self.prefix
+        lines = [
+            '# HELP %s_jobs_total Finished jobs.' % p,
+            '# TYPE %s_jobs_total counter' % p,
+        ]
+        with self._lock:
+            for (kind, status), n in sorted(self._jobs.items()):
+                lines.append('%s_jobs_total{kind="%s",status="%s"} %d' % (p, kind, status, n))
+            lines += [
+                '# HELP %s_stage_seconds_total Cumulative time per processing stage.' % p,
+                '# TYPE %s_stage_seconds_total counter' % p,
+            ]
+            for (kind, stage), seconds in sorted(self._stages.items()):
+                lines.append('%s_stage_seconds_total{kind="%s",stage="%s"} %.6f' % (p, kind, stage, seconds))
+            for name in COUNTERS:
+                lines += [
+                    '# HELP %s_%s_total Total %s over finished jobs.' % (p, name, name.replace('_', ' ')),
+                    '# TYPE %s_%s_total counter' % (p, name),
+                ]
+                for (kind, counter), value in sorted(self._counters.items()):
+                    if counter == name:
+                        lines.append('%s_%s_total{kind="%s"} %d' % (p, name, kind, value))
+        rss = peak_rss_mb()
+        if rss is not None:
+            lines += [
+                '# HELP %s_peak_rss_bytes Peak resident memory of the process.' % p,
+                '# TYPE %s_peak_rss_bytes gauge' % p,
+                '%s_peak_rss_bytes %d' % (p, rss * 1024 * 1024),
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+def serve_metrics(registry, port, host='0.0.0.0'):
+    """
+    Serve registry at http://host:port/metrics from a daemon thread.
+    Returns the HTTP server (call shutdown() to stop it).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.to_prometheus().encode('utf8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def traced(name):
+    """
+    Decorator profiling each call with cProfile when MAGIC_REMOVER_PROFILE
+    names a directory; the dump is written there as
+    <name>-<time>-<pid>-<n>.prof.
+    Only the calling thread is profiled. Without the variable, calls run as is.
+    """
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            directory = os.environ.get(PROFILE_ENV)
+            if not directory:
+                return fn(*args, **kwargs)
+            os.makedirs(directory, exist_ok=True)
+            profile = cProfile.Profile()
+            try:
+                return profile.runcall(fn, *args, **kwargs)
+            finally:
+                path = os.path.join(directory, '%s-%s-%d-%d.prof' % (
+                    name, time.strftime('%Y%m%d-%H%M%S'), os.getpid(), next(_profile_ids)))
+                profile.dump_stats(path)
+        return wrapper
+    return decorate
@@ -0,0 +1,86 @@
+"""
+Lifecycle of job output directories.
+
+Every job writes into its own directory under one root. Finished jobs'
+directories are evicted when they get older than max_age, and the oldest
+ones go first while the root holds more than max_bytes. Directories of
+running jobs are never evicted.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+
+class OutputManager:
+    """
+    root: Directory holding the job directories (created if missing).
+          None uses <system temp>/magic-remover.
+    max_age: Seconds after its last write a finished job's directory is kept.
+    max_bytes: Disk budget for all job directories together.
+    """
+    def __init__(self, root=None, max_age=2 * 3600, max_bytes=4 * 2**30):
+        self.root = root or os.path.join(tempfile.gettempdir(), 'magic-remover')
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self._active = set()
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def new_dir(self, prefix='job-'):
+        """
+        Evict what is over age or budget, then create a directory for a new
+        job. It is kept until release() is called with it.
+        """
+        self.evict()
+        path = tempfile.mkdtemp(prefix=prefix, dir=self.root)
+        with self._lock:
+            self._active.add(path)
+        return path
+
+    def release(self, path):
+        """Mark the job directory as finished, so it may be evicted."""
+        with self._lock:
+            self._active.discard(path)
+
+    def usage(self):
+        """Total bytes of all job directories."""
+        return sum(size for _, _, size in self._scan())
+
+    def evict(self, now=None):
+        """Remove expired directories, then the oldest until under budget. Returns the removed paths."""
+        now = time.time() if now is None else now
+        with self._lock:
+            active = set(self._active)
+
+        entries = sorted(self._scan())  # oldest first
+        total = sum(size for _, _, size in entries)
+        removed = []
+        for mtime, path, size in entries:
+            if path in active:
+                continue
+            if now - mtime > self.max_age or total > self.max_bytes:
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+                removed.append(path)
+        return removed
+
+    def _scan(self):
+        """(last write, path, bytes) of every job directory."""
+        entries = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            mtime = entry.stat().st_mtime
+            size = 0
+            for dirpath, _, filenames in os.walk(entry.path):
+                for name in filenames:
+                    try:
+                        st = os.stat(os.path.join(dirpath, name))
+                    except FileNotFoundError:  # Removed while scanning
+                        continue
+                    size += st.st_size
+                    mtime = max(mtime, st.st_mtime)
+            entries.append((mtime, entry.path, size))
+        return entries
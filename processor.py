@@ -1,18 +1,320 @@
 import cv2
 import numpy as np
 from moviepy.editor import VideoFileClip, AudioFileClip
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+import multiprocessing
+import subprocess
+import threading
+import queue
 import tempfile
+import shutil
+import time
+import math
 import os
+import re
 
-def inpaint_frame_opencv(frame, mask, roi=None):
+from inpainting import BACKENDS, BackendStats, choose_backend, needs_source, validate_backend, INPAINT_RADIUS
+from metrics import JobMetrics, traced
+from encoder_profiles import audio_args, encoder_threads, get_profile
+
+class InpaintCache:
+    """
+    Frame-to-frame cache of inpainted patches.
+    Slide-style videos repeat the same frame for seconds at a time, so while
+    the context ring around the mask (the pixels inpainting reads from) stays
+    unchanged, the previous fill is reused instead of running cv2.inpaint.
+    tolerance: Largest mean absolute difference (0~255, per channel) of the
+               context ring that still counts as unchanged. 0 reuses only on
+               identical context.
+    """
+    def __init__(self, tolerance=1.0):
+        self.tolerance = tolerance
+        self.hits = 0
+        self.misses = 0
+        self._patches = {}
+
+    def inpaint(self, key, area, dilated_mask, out=None, ring=None, fill=None):
+        """
+        Inpaint area (a frame region) with dilated_mask, reusing the patch
+        stored under key when the context has not changed.
+        out: Optional preallocated buffer (same shape as area) for the result.
+        ring: Optional precomputed context mask (inverse of dilated_mask).
+        fill: Optional function fill(area, out) run on a miss instead of
+              cv2.INPAINT_TELEA.
+        Returns the inpainted region (out, if given).
+        """
+        if fill is None:
+            fill = lambda area, out: cv2.inpaint(area, dilated_mask, INPAINT_RADIUS, cv2.INPAINT_TELEA, out)
+        if out is None:
+            out = np.empty_like(area)
+
+        entry = self._patches.get(key)
+        if entry is not None and entry[0].shape == area.shape:
+            previous, diff = entry
+            if ring is None:
+                ring = cv2.bitwise_not(dilated_mask)
+            cv2.absdiff(area, previous, diff)
+            change = max(cv2.mean(diff, mask=ring)[:3])
+            if change <= self.tolerance:
+                self.hits += 1
+                np.copyto(out, area)
+                cv2.copyTo(previous, dilated_mask, out)
+                return out
+
+            self.misses += 1
+            fill(area, out)
+            np.copyto(previous, out)
+            return out
+
+        self.misses += 1
+        fill(area, out)
+        # Context pixels are untouched by inpainting, so the result doubles
+        # as the reference context for the next frame.
+        self._patches[key] = (out.copy(), np.empty_like(out))
+        return out
+
+class _PlanRegion:
+    """One mask region of a MaskPlan with its precomputed buffers."""
+    def __init__(self, key, bounds, mask, source=None):
+        self.key = key  # (x, y, w, h) tight bounding box
+        self.x1, self.y1, self.x2, self.y2 = bounds  # Padded bounds
+        self.mask = mask  # Dilated mask of the padded area
+        self.ring = cv2.bitwise_not(mask)  # Context pixels
+        self.scratch = np.empty(mask.shape + (3,), dtype=np.uint8)
+        # Patch source for the 'patch' backend: (y, x, h, w, dy, dx) of the
+        # mask's bounding box in the area and the offset of the clean copy
+        self.source = source
+
+    def with_source(self, frame_w, frame_h):
+        """
+        Region whose area also holds a clean, same-sized neighbour of the
+        mask to copy from (left, right, above or below, whichever fits),
+        or this region if it has one already or none fits.
+        """
+        if self.source is not None:
+            return self
+        x, y, w, h = cv2.boundingRect(self.mask)
+        fx, fy = self.x1 + x, self.y1 + y
+        for dx, dy in ((-w, 0), (w, 0), (0, -h), (0, h)):
+            if 0 <= fx + dx and fx + dx + w <= frame_w and 0 <= fy + dy and fy + dy + h <= frame_h:
+                break
+        else:
+            return self
+
+        x1, y1 = min(self.x1, fx + dx), min(self.y1, fy + dy)
+        x2, y2 = max(self.x2, fx + dx + w), max(self.y2, fy + dy + h)
+        mask = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+        mask[self.y1 - y1:self.y2 - y1, self.x1 - x1:self.x2 - x1] = self.mask
+        return _PlanRegion(self.key, (x1, y1, x2, y2), mask, (fy - y1, fx - x1, h, w, dy, dx))
+
+def _merge_boxes(boxes, pad):
+    """
+    Merge (x, y, w, h) boxes whose padded areas overlap.
+    Returns the merged boxes.
+    """
+    rects = [[x, y, x + w, y + h] for x, y, w, h in boxes]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(rects)):
+            for j in range(i + 1, len(rects)):
+                a, b = rects[i], rects[j]
+                if (a[0] - pad < b[2] + pad and b[0] - pad < a[2] + pad and
+                        a[1] - pad < b[3] + pad and b[1] - pad < a[3] + pad):
+                    rects[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                    del rects[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in rects]
+
+class MaskPlan:
+    """
+    Inpainting plan for a whole video, built once from the binary mask.
+    Holds the dilated mask, padded bounds and scratch buffer of every mask
+    region, so apply() does no per-frame setup or allocation.
+    Disjoint regions (e.g. two logos in opposite corners) each get their own
+    tight bounding box; regions whose padded boxes touch are merged.
+    mask_binary: uint8 mask (0 or 255) with the size of the video frames.
+    pad: Context pixels added around each region.
+    backend: Inpainting backend (see inpainting.BACKEND_NAMES).
+    """
+    def __init__(self, mask_binary, pad=5, backend='telea'):
+        self.shape = mask_binary.shape[:2]
+        self.kernel = np.ones((3,3), np.uint8)
+        self.backend = validate_backend(backend)
+        self.regions = []
+        self.roi = None
+
+        n, _, stats, _ = cv2.connectedComponentsWithStats(mask_binary, connectivity=8)
+        boxes = _merge_boxes([tuple(int(v) for v in stats[i, :4]) for i in range(1, n)], pad)
+
+        h_src, w_src = self.shape
+        for x, y, w, h in boxes:
+            x1 = max(0, x - pad)
+            y1 = max(0, y - pad)
+            x2 = min(w_src, x + w + pad)
+            y2 = min(h_src, y + h + pad)
+            dilated = cv2.dilate(mask_binary[y1:y2, x1:x2], self.kernel, iterations=1)
+            self.regions.append(_PlanRegion((x, y, w, h), (x1, y1, x2, y2), dilated))
+        self._add_sources()
+
+        if boxes:
+            x1 = min(b[0] for b in boxes)
+            y1 = min(b[1] for b in boxes)
+            x2 = max(b[0] + b[2] for b in boxes)
+            y2 = max(b[1] + b[3] for b in boxes)
+            self.roi = (x1, y1, x2 - x1, y2 - y1)  # Bounding box of all regions
+
+    @classmethod
+    def from_rects(cls, rects, frame_size, pad=5, backend='telea'):
+        """
+        Plan for rectangular regions without building or scanning a
+        full-frame mask: only the padded ROI masks are allocated.
+        rects: (x, y, w, h) pixel rectangles.
+        frame_size: (width, height) of the video frames.
+        """
+        w_src, h_src = frame_size
+        plan = cls.__new__(cls)
+        plan.shape = (h_src, w_src)
+        plan.kernel = np.ones((3,3), np.uint8)
+        plan.backend = validate_backend(backend)
+        plan.regions = []
+        plan.roi = None
+
+        clipped = []
+        for x, y, w, h in rects:
+            x0, y0 = max(0, int(x)), max(0, int(y))
+            x1, y1 = min(w_src, int(x + w)), min(h_src, int(y + h))
+            if x1 > x0 and y1 > y0:
+                clipped.append((x0, y0, x1 - x0, y1 - y0))
+        boxes = _merge_boxes(clipped, pad)
+
+        for x, y, w, h in boxes:
+            x1 = max(0, x - pad)
+            y1 = max(0, y - pad)
+            x2 = min(w_src, x + w + pad)
+            y2 = min(h_src, y + h + pad)
+            mask_roi = np.zeros((y2 - y1, x2 - x1), dtype=np.uint8)
+            for rx, ry, rw, rh in clipped:
+                # Merged boxes may hold several rectangles
+                mask_roi[max(ry - y1, 0):max(ry + rh - y1, 0), max(rx - x1, 0):max(rx + rw - x1, 0)] = 255
+            dilated = cv2.dilate(mask_roi, plan.kernel, iterations=1)
+            plan.regions.append(_PlanRegion((x, y, w, h), (x1, y1, x2, y2), dilated))
+        plan._add_sources()
+
+        if boxes:
+            x1 = min(b[0] for b in boxes)
+            y1 = min(b[1] for b in boxes)
+            x2 = max(b[0] + b[2] for b in boxes)
+            y2 = max(b[1] + b[3] for b in boxes)
+            plan.roi = (x1, y1, x2 - x1, y2 - y1)
+        return plan
+
+    def copy(self):
+        """
+        Plan sharing this plan's (read-only) masks but with its own scratch
+        buffers, so concurrent jobs can use cached plans safely.
+        """
+        h, w = self.shape
+        return self.crop(0, 0, w, h)
+
+    def with_backend(self, backend):
+        """Copy of this plan using another inpainting backend."""
+        plan = self.copy()
+        plan.backend = validate_backend(backend)
+        plan._add_sources()
+        return plan
+
+    def _add_sources(self):
+        # Only the patch backends read outside the padded area
+        if needs_source(self.backend):
+            h_src, w_src = self.shape
+            self.regions = [region.with_source(w_src, h_src) for region in self.regions]
+
+    @property
+    def bounds(self):
+        """(x1, y1, x2, y2) of the area the regions read and write, or None."""
+        if not self.regions:
+            return None
+        return (min(r.x1 for r in self.regions), min(r.y1 for r in self.regions),
+                max(r.x2 for r in self.regions), max(r.y2 for r in self.regions))
+
+    def crop(self, x1, y1, x2, y2):
+        """
+        Plan for the sub-frame [y1:y2, x1:x2], which must contain the
+        bounds of every region.
+        """
+        plan = MaskPlan.__new__(MaskPlan)
+        plan.shape = (y2 - y1, x2 - x1)
+        plan.kernel = self.kernel
+        plan.backend = self.backend
+        plan.regions = []
+        for region in self.regions:
+            x, y, w, h = region.key
+            bounds = (region.x1 - x1, region.y1 - y1, region.x2 - x1, region.y2 - y1)
+            # The patch source is relative to the area, so it moves with it
+            plan.regions.append(_PlanRegion((x - x1, y - y1, w, h), bounds, region.mask, region.source))
+        plan.roi = None
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            plan.roi = (x - x1, y - y1, w, h)
+        return plan
+
+    def scaled(self, width, height):
+        """
+        Plan for the frames resized to width x height. Each region becomes the
+        scaled rectangle of its bounding box.
+        """
+        h_src, w_src = self.shape
+        sx, sy = width / w_src, height / h_src
+        rects = []
+        for region in self.regions:
+            x, y, w, h = region.key
+            x1, y1 = int(x * sx), int(y * sy)
+            rects.append((x1, y1, math.ceil((x + w) * sx) - x1, math.ceil((y + h) * sy) - y1))
+        return MaskPlan.from_rects(rects, (width, height), backend=self.backend)
+
+    def apply(self, frame, cache=None, stats=None):
+        """
+        Inpaint every region of frame (writable RGB array) in place.
+        cache: Optional InpaintCache reused across consecutive frames.
+        stats: Optional BackendStats recording the time of each backend call.
+        Returns frame.
+        """
+        for region in self.regions:
+            area = frame[region.y1:region.y2, region.x1:region.x2]
+            if cache is not None:
+                cache.inpaint(region.key, area, region.mask, out=region.scratch, ring=region.ring,
+                              fill=lambda area, out: self._fill(area, region, out, stats))
+            else:
+                self._fill(area, region, region.scratch, stats)
+            cv2.copyTo(region.scratch, region.mask, area)
+        return frame
+
+    def _fill(self, area, region, out, stats):
+        backend = choose_backend(area, region) if self.backend == 'auto' else self.backend
+        start = time.perf_counter()
+        BACKENDS[backend](area, region, out)
+        if stats is not None:
+            stats.record(backend, time.perf_counter() - start)
+
+def inpaint_frame_opencv(frame, mask, roi=None, inplace=False, cache=None):
     """
     Apply OpenCV inpainting to a single frame.
     frame: numpy array (RGB)
     mask: numpy array (Grayscale/Single channel), where 255 is the area to inpaint.
     roi: tuple (x, y, w, h) of the bounding box to process. If None, process full frame.
+    inplace: If True, write the result into frame instead of a copy.
+    cache: Optional InpaintCache reused across consecutive frames.
     """
     # Create a writable copy of the frame
-    frame = frame.copy()
+    if not inplace:
+        frame = frame.copy()
 
     # Ensure mask is uint8
     if mask.dtype != np.uint8:
@@ -40,41 +342,584 @@ def inpaint_frame_opencv(frame, mask, roi=None):
         dilated_mask_roi = cv2.dilate(mask_roi, kernel, iterations=1)
         
         # Inpaint ROI
-        inpainted_roi = cv2.inpaint(frame_roi, dilated_mask_roi, 3, cv2.INPAINT_TELEA)
+        if cache is not None:
+            inpainted_roi = cache.inpaint(tuple(roi), frame_roi, dilated_mask_roi)
+        else:
+            inpainted_roi = cv2.inpaint(frame_roi, dilated_mask_roi, 3, cv2.INPAINT_TELEA)
         
         # Copy back
         frame[y1:y2, x1:x2] = inpainted_roi
         return frame
     else:
         dilated_mask = cv2.dilate(mask, kernel, iterations=1)
-        inpainted = cv2.inpaint(frame, dilated_mask, 3, cv2.INPAINT_TELEA)
+        if cache is not None:
+            inpainted = cache.inpaint(None, frame, dilated_mask)
+        else:
+            inpainted = cv2.inpaint(frame, dilated_mask, 3, cv2.INPAINT_TELEA)
+        if inplace:
+            frame[:] = inpainted
+            return frame
         return inpainted
 
 from proglog import ProgressBarLogger
 
 class MyBarLogger(ProgressBarLogger):
-    def __init__(self, callback):
+    # moviepy writes the audio track first ('chunk' bar), then the frames ('t' bar)
+    STAGES = {'chunk': 'audio', 't': 'decode_encode'}
+
+    def __init__(self, callback, metrics=None):
         super().__init__()
         self.progress_notifier = callback
+        self.metrics = metrics
+        self._bar = None
 
     def bars_callback(self, bar, attr, value, old_value=None):
+        if self.metrics is not None and bar != self._bar and bar in self.STAGES:
+            self._bar = bar
+            self.metrics.switch(self.STAGES[bar])
         # Only track the 't' (time) bar which represents frame processing
         if bar == 't':
             percentage = (value / self.bars[bar]['total'])
             if self.progress_notifier:
                 self.progress_notifier(percentage)
 
-def process_video_with_mask(input_path, output_path, mask_image, progress_callback=None):
+def _prepare_mask(mask_image, video_w, video_h, backend=None):
     """
-    Process video frame by frame.
-    input_path: Path to input video.
-    output_path: Path to save output video.
-    mask_image: Boolean or 0-255 numpy array defining the region to remove.
-               Must match video aspect ratio/size roughly, or be resized.
-    progress_callback: Function that accepts a float (0.0 to 1.0) for progress updates.
+    Resize and threshold a mask to the video size and build its MaskPlan.
+    A MaskPlan is used as is, after checking its size.
+    backend: Inpainting backend; None keeps a MaskPlan's own backend.
+    """
+    if isinstance(mask_image, MaskPlan):
+        if mask_image.shape != (video_h, video_w):
+            raise ValueError("Mask plan is %dx%d but the video is %dx%d" % (
+                mask_image.shape[1], mask_image.shape[0], video_w, video_h))
+        if backend is not None and backend != mask_image.backend:
+            return mask_image.with_backend(backend)
+        return mask_image
+
+    mask_h, mask_w = mask_image.shape[:2]
+
+    # Ensure mask matches video size
+    if (mask_w != video_w) or (mask_h != video_h):
+         # Resize mask using OpenCV (handling the boolean/grayscale properly)
+         mask_resized = cv2.resize(mask_image.astype(np.uint8), (video_w, video_h), interpolation=cv2.INTER_NEAREST)
+    else:
+        mask_resized = mask_image.astype(np.uint8)
+
+    # Threshold to ensure binary mask for inpainting (0 or 255)
+    # Assuming input mask might be anti-aliased or have alpha
+    _, mask_binary = cv2.threshold(mask_resized, 127, 255, cv2.THRESH_BINARY)
+
+    # Optimization: Inpaint ONLY the bounding boxes of the mask regions, not the whole 4K frame.
+    return MaskPlan(mask_binary, backend=backend or 'telea')
+
+def _summary(frames, elapsed, stats=None, metrics=None):
+    """Success message with throughput, peak memory (sampled during the job) and backend latency of the run."""
+    fps = frames / elapsed if elapsed > 0 else 0.0
+    if metrics is None or not metrics.sample_rss():
+        message = "Success (%d frames, %.1f fps)" % (frames, fps)
+    else:
+        message = "Success (%d frames, %.1f fps, peak RSS %.0f MB)" % (frames, fps, metrics.peak_rss_mb)
+    if stats is not None and stats.calls:
+        message += " [%s]" % stats
+    return message
+
+def _frame_times(duration, fps):
+    """Frame timestamps exactly as moviepy's iter_frames produces them."""
+    return np.arange(0, duration, 1.0 / fps)
+
+# Shared progress counters and stop flag for segment workers (set by _init_segment_worker)
+_frames_done = None
+_cache_hits = None
+_cache_misses = None
+_stop = None
+
+def _init_segment_worker(frames_done, cache_hits, cache_misses, stop=None):
+    global _frames_done, _cache_hits, _cache_misses, _stop
+    _frames_done = frames_done
+    _cache_hits = cache_hits
+    _cache_misses = cache_misses
+    _stop = stop
+
+def _process_segment(input_path, segment_path, plan, start, end, cache_tolerance=None, profile=None, threads=1):
+    """
+    Inpaint frames [start, end) of the video and encode them (video only)
+    to segment_path. Runs inside a worker process.
+    cache_tolerance: If not None, each worker keeps its own InpaintCache.
+    profile: EncoderProfile (or name); threads: encoder threads of this worker.
+    Returns (segment_path, stats) with the worker's BackendStats.
+    """
+    clip = VideoFileClip(input_path, audio=False)
+    writer = None
+    cache = InpaintCache(cache_tolerance) if cache_tolerance is not None else None
+    stats = BackendStats()
+    try:
+        fps = clip.fps
+        times = _frame_times(clip.duration, fps)[start:end]
+        writer = FFMPEG_VideoWriter(segment_path, clip.size, fps, **get_profile(profile).writer_kwargs(threads))
+        for t in times:
+            if _stop is not None and _stop.value:
+                raise RuntimeError("Stopped by the parent process")
+            frame = clip.get_frame(t)
+            if plan.regions:
+                hits, misses = (cache.hits, cache.misses) if cache else (0, 0)
+                # moviepy frames are read-only views of the decoder buffer
+                frame = plan.apply(frame.copy(), cache, stats)
+                if cache is not None and _cache_hits is not None:
+                    with _cache_hits.get_lock():
+                        _cache_hits.value += cache.hits - hits
+                    with _cache_misses.get_lock():
+                        _cache_misses.value += cache.misses - misses
+            writer.write_frame(frame.astype('uint8'))
+            if _frames_done is not None:
+                with _frames_done.get_lock():
+                    _frames_done.value += 1
+        return segment_path, stats
+    finally:
+        if writer is not None:
+            writer.close()
+        clip.close()
+
+def _probe_audio_codec(input_path):
+    """Codec name of the first audio stream (e.g. 'aac'), or None."""
+    cmd = [get_setting("FFMPEG_BINARY"), '-hide_banner', '-i', input_path]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    match = re.search(rb'Stream #\S+.*?: Audio: (\w+)', result.stderr)
+    return match.group(1).decode('ascii') if match else None
+
+def _mux_audio(video_path, input_path, output_path, audio_codec):
+    """
+    Combine an encoded, silent video with the audio of input_path, copying
+    the video stream (and the audio too when it is AAC already).
+    """
+    cmd = [get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error', '-i', video_path, '-i', input_path,
+           '-map', '0:v:0', '-map', '1:a:0', '-c:v', 'copy'] + audio_args(audio_codec) + [
+           '-movflags', '+faststart', output_path]
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode('utf8', 'replace').strip())
+
+# MP4 outputs put the index first, so playback can start before the download finishes
+FASTSTART = ['-movflags', '+faststart']
+
+# Length of the segments written for streaming output
+STREAM_SEGMENT_SECONDS = 2
+STREAM_LIST = 'segments.csv'
+
+def _output_args(output_path, stream_dir=None, seconds=STREAM_SEGMENT_SECONDS):
+    """
+    ffmpeg output arguments: a faststart MP4 at output_path, or with
+    stream_dir, standalone MP4 segments cut on forced keyframes every
+    `seconds` and listed in stream_dir/segments.csv as each one closes.
+    """
+    if stream_dir is None:
+        return FASTSTART + [output_path]
+    return ['-force_key_frames', 'expr:gte(t,n_forced*%g)' % seconds,
+            '-f', 'segment', '-segment_time', '%g' % seconds, '-segment_format', 'mp4', '-reset_timestamps', '1',
+            '-segment_list', os.path.join(stream_dir, STREAM_LIST), '-segment_list_type', 'csv',
+            os.path.join(stream_dir, 'seg%05d.mp4')]
+
+def stream_segments(stream_dir):
+    """
+    Paths of the finished segments in stream_dir, in playback order. The
+    segment being written is only listed once it is complete.
+    """
+    try:
+        with open(os.path.join(stream_dir, STREAM_LIST)) as f:
+            return [os.path.join(stream_dir, line.split(',')[0]) for line in f if line.strip()]
+    except FileNotFoundError:
+        return []
+
+def _join_segments(segment_paths, input_path, output_path, audio_codec):
+    """
+    Concatenate encoded segments without re-encoding and mux the original
+    audio (stream-copied if it is AAC). audio_codec is None without audio.
+    """
+    list_path = os.path.join(os.path.dirname(segment_paths[0]), 'segments.txt')
+    with open(list_path, 'w') as f:
+        for path in segment_paths:
+            f.write("file '%s'\n" % path.replace("'", "'\\''"))
+
+    cmd = [get_setting("FFMPEG_BINARY"), '-y', '-loglevel', 'error',
+           '-f', 'concat', '-safe', '0', '-i', list_path]
+    if audio_codec:
+        cmd += ['-i', input_path, '-map', '0:v:0', '-map', '1:a:0'] + audio_args(audio_codec)
+    cmd += ['-c:v', 'copy', '-movflags', '+faststart', output_path]
+
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode('utf8', 'replace').strip())
+
+def _process_video_parallel(input_path, output_path, plan, clip, workers, progress_callback=None, cache=None, stats=None,
+                            metrics=None, profile=None):
+    """
+    Split the video into frame ranges, inpaint and encode each range in a
+    process pool, then join the segments losslessly with the original audio.
+    Frames are sampled at the same timestamps as the serial path, so the
+    output matches it frame for frame.
+    metrics: Optional JobMetrics; receives the time spent on the segments
+             ('segments') and on joining them with the audio ('mux').
+    profile: EncoderProfile (or name); the cores are shared between the workers' encoders.
+    If progress_callback raises, the workers stop at their next frame and the
+    exception propagates.
+    Returns the number of frames processed.
+    """
+    if metrics is None:
+        metrics = JobMetrics()
+    total = len(_frame_times(clip.duration, clip.fps))
+    audio_codec = _probe_audio_codec(input_path) if clip.audio is not None else None
+    workers = max(1, min(workers, total))
+    bounds = [total * i // workers for i in range(workers + 1)]
+
+    work_dir = tempfile.mkdtemp()
+    counter = multiprocessing.Value('l', 0)
+    cache_hits = multiprocessing.Value('l', 0)
+    cache_misses = multiprocessing.Value('l', 0)
+    stop = multiprocessing.Value('b', 0)
+    cache_tolerance = cache.tolerance if cache is not None else None
+    base_hits, base_misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    try:
+        segment_paths = [os.path.join(work_dir, 'segment_%04d.mp4' % i) for i in range(workers)]
+        metrics.switch('segments')
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_segment_worker,
+                                 initargs=(counter, cache_hits, cache_misses, stop)) as pool:
+            futures = [
+                pool.submit(_process_segment, input_path, segment_paths[i], plan,
+                            bounds[i], bounds[i + 1], cache_tolerance, profile, encoder_threads(workers))
+                for i in range(workers)
+            ]
+            pending = futures
+            try:
+                while pending:
+                    done, pending = wait(pending, timeout=0.5, return_when=FIRST_EXCEPTION)
+                    for future in done:
+                        _, segment_stats = future.result()  # Re-raises worker errors
+                        if stats is not None:
+                            stats.merge(segment_stats)
+                    if cache is not None:
+                        # Mirror the workers' counters so the callback can read them
+                        cache.hits = base_hits + cache_hits.value
+                        cache.misses = base_misses + cache_misses.value
+                    if progress_callback:
+                        progress_callback(counter.value / total)
+            except BaseException:
+                # Otherwise the pool's shutdown would wait for every segment to finish
+                stop.value = 1
+                raise
+
+        metrics.switch('mux')
+        _join_segments(segment_paths, input_path, output_path, audio_codec)
+        metrics.switch(None)
+        return total
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def _read_frame_into(stream, buf):
+    """
+    Fill buf (a preallocated frame array) with the next raw frame from stream.
+    Returns False at end of stream.
+    """
+    view = memoryview(buf).cast('B')
+    filled = 0
+    while filled < len(view):
+        n = stream.readinto(view[filled:])
+        if not n:
+            return False
+        filled += n
+    return True
+
+def _probe_video(input_path):
+    """
+    Read size, fps, frame count and audio codec without decoding frames.
+    Returns (width, height, fps, nframes, audio_codec); audio_codec is None
+    if the video has no audio.
+    """
+    infos = ffmpeg_parse_infos(input_path)
+    w, h = infos['video_size']
+    # ffmpeg applies the rotation on decode, like moviepy's reader does
+    if infos.get('video_rotation') in (90, 270):
+        w, h = h, w
+    audio_codec = _probe_audio_codec(input_path) if infos['audio_found'] else None
+    return w, h, infos['video_fps'], infos['video_nframes'], audio_codec
+
+class MemoryBudgetError(Exception):
+    """Raised when a video cannot be processed within the memory budget."""
+    pass
+
+MIN_POOL = 2  # One frame being inpainted while the next one is decoded
+MAX_POOL = 8
+MIN_SCALE = 0.25  # Refuse rather than downscale further than this
+PIPELINE_OVERHEAD_MB = 4  # Pipe buffers and the pipeline threads
+# Per pixel of a mask region: mask, context ring, scratch, cached patch and
+# diff, and cv2.inpaint's temporaries
+REGION_BYTES_PER_PIXEL = 24
+
+class _Budget:
+    """
+    How a pipe or roi run fits its memory budget.
+    pool: Frame buffers in flight.
+    size: (width, height) the frames are scaled to before inpainting, or None.
+    footprint_mb: Memory the run allocates, or None without a budget.
+    """
+    def __init__(self, pool=MAX_POOL, size=None, footprint_mb=None):
+        self.pool = pool
+        self.size = size
+        self.footprint_mb = footprint_mb
+
+def _fit_budget(budget_mb, engine, plan, video_w, video_h):
+    """
+    Size the job's frame buffer pool to budget_mb. The budget covers what the
+    job itself allocates: the pool, its mask regions' buffers and the
+    pipeline overhead. Everything is allocated before the first frame and
+    nothing per frame, so the footprint stays fixed for the whole video.
+    Memory used by the rest of the process (other jobs, caches) does not
+    count against it.
+    A roi run only holds the watermark strip; a pipe run that cannot hold
+    MIN_POOL full frames is downscaled (to even dimensions) down to
+    MIN_SCALE. Raises MemoryBudgetError if the budget cannot be met.
+    Returns a _Budget.
+    """
+    if budget_mb is None:
+        return _Budget()
+    frame_w, frame_h = video_w, video_h
+    if engine == 'roi' and plan.roi is not None:
+        x1, y1, x2, y2 = _roi_strip_bounds(plan.bounds, video_w, video_h)
+        frame_w, frame_h = x2 - x1, y2 - y1
+
+    region_pixels = sum((r.x2 - r.x1) * (r.y2 - r.y1) for r in plan.regions)
+    fixed_mb = PIPELINE_OVERHEAD_MB + region_pixels * REGION_BYTES_PER_PIXEL / 2**20
+    available = budget_mb - fixed_mb
+    frame_mb = frame_w * frame_h * 3 / 2**20
+    pool = min(int(available // frame_mb), MAX_POOL) if available > 0 else 0
+    if pool >= MIN_POOL:
+        return _Budget(pool, None, fixed_mb + pool * frame_mb)
+
+    scale = math.sqrt(max(available, 0) / (MIN_POOL * frame_mb))
+    if frame_w != video_w or frame_h != video_h or scale < MIN_SCALE:
+        smallest = MIN_POOL * frame_mb * (MIN_SCALE ** 2 if (frame_w, frame_h) == (video_w, video_h) else 1)
+        raise MemoryBudgetError("A %d MB memory budget is too small for %dx%d video (at least %d MB needed)" % (
+            budget_mb, video_w, video_h, math.ceil(fixed_mb + smallest)))
+    size = (int(video_w * scale) // 2 * 2, int(video_h * scale) // 2 * 2)
+    return _Budget(MIN_POOL, size, fixed_mb + MIN_POOL * size[0] * size[1] * 3 / 2**20)
+
+def _run_frame_pipeline(decode_cmd, encode_cmd, frame_shape, process_frame, nframes, progress_callback=None, queue_size=8,
+                        metrics=None):
+    """
+    Stream raw RGB frames from an ffmpeg decoder into a fixed pool of
+    preallocated buffers, run process_frame on each buffer in place and
+    write the bytes straight into an ffmpeg encoder.
+    Decode, process and encode run concurrently, connected by bounded queues.
+    metrics: Optional JobMetrics; receives the time spent reading decoded
+             frames ('decode'), in process_frame ('inpaint'), writing to the
+             encoder ('encode') and waiting for the encoder to finish
+             ('finalize', which includes muxing the audio).
+    If process_frame or progress_callback raises (e.g. to cancel the job),
+    both ffmpeg processes are killed and the exception propagates.
+    Returns the number of frames processed.
+    """
+    if metrics is None:
+        metrics = JobMetrics()
+    # The buffer pool bounds memory: at most queue_size frames are in flight
+    free = queue.Queue()
+    for _ in range(queue_size):
+        free.put(np.empty(frame_shape, dtype=np.uint8))
+    decoded = queue.Queue(maxsize=queue_size)
+    encoded = queue.Queue(maxsize=queue_size)
+    errors = []
+
+    decoder = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    encoder = subprocess.Popen(encode_cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def read_loop():
+        try:
+            while True:
+                buf = free.get()
+                start = time.perf_counter()
+                if not _read_frame_into(decoder.stdout, buf):
+                    break
+                metrics.add_time('decode', time.perf_counter() - start)
+                decoded.put(buf)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            decoded.put(None)
+
+    def write_loop():
+        while True:
+            buf = encoded.get()
+            if buf is None:
+                break
+            try:
+                if not errors:
+                    start = time.perf_counter()
+                    encoder.stdin.write(buf.data)
+                    metrics.add_time('encode', time.perf_counter() - start)
+            except Exception as e:
+                errors.append(e)
+            # Return the buffer even after an error so the reader never starves
+            free.put(buf)
+
+    # Named after their stage so profiler thread dumps are easy to read
+    reader = threading.Thread(target=read_loop, name='pipeline-decode', daemon=True)
+    writer = threading.Thread(target=write_loop, name='pipeline-encode', daemon=True)
+    reader.start()
+    writer.start()
+
+    frames = 0
+    finished = False
+    try:
+        while True:
+            buf = decoded.get()
+            if buf is None:
+                break
+            if not errors:
+                with metrics.stage('inpaint'):
+                    process_frame(buf)
+            encoded.put(buf)
+            frames += 1
+            if progress_callback and nframes:
+                progress_callback(min(frames / nframes, 1.0))
+        finished = True
+    finally:
+        if not finished:
+            # Interrupted: stop both ffmpeg processes instead of finishing the output
+            decoder.kill()
+            encoder.kill()
+            # Keep handing buffers back until the reader sees the end of the decoder's output
+            while reader.is_alive():
+                try:
+                    buf = decoded.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if buf is not None:
+                    free.put(buf)
+        encoded.put(None)
+        writer.join()
+        reader.join(timeout=5)
+        if decoder.poll() is None:
+            decoder.kill()
+        decoder.wait()
+        with metrics.stage('finalize'):
+            try:
+                encoder.stdin.close()
+            except BrokenPipeError:  # The encoder was killed
+                pass
+            encoder_err = encoder.stderr.read()
+            encoder.wait()
+
+    if errors:
+        raise errors[0]
+    if encoder.returncode != 0:
+        raise RuntimeError(encoder_err.decode('utf8', 'replace').strip())
+    return frames
+
+def _process_video_pipe(input_path, output_path, plan, video_info, progress_callback=None, cache=None, stats=None,
+                        metrics=None, profile=None, stream_dir=None, budget=None):
+    """
+    Decode full frames through an ffmpeg pipe, inpaint the ROI in place and
+    re-encode them. Returns the number of frames processed.
+    budget: Optional _Budget (buffer pool size and output size).
+    """
+    w, h, fps, nframes, audio_codec = video_info
+    ffmpeg = get_setting("FFMPEG_BINARY")
+    budget = budget or _Budget()
+
+    decode_cmd = [ffmpeg, '-loglevel', 'error', '-i', input_path]
+    if budget.size is not None:
+        w, h = budget.size
+        decode_cmd += ['-vf', 'scale=%d:%d' % (w, h)]
+        plan = plan.scaled(w, h)
+    decode_cmd += ['-f', 'rawvideo', '-pix_fmt', 'rgb24', '-an', '-']
+    encode_cmd = [ffmpeg, '-y', '-loglevel', 'error',
+                  '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', '%dx%d' % (w, h), '-r', repr(fps),
+                  '-i', '-']
+    if audio_codec and stream_dir is None:
+        encode_cmd += ['-i', input_path, '-map', '0:v:0', '-map', '1:a:0'] + audio_args(audio_codec)
+    encode_cmd += get_profile(profile).ffmpeg_args(encoder_threads()) + _output_args(output_path, stream_dir)
+
+    def process_frame(frame):
+        plan.apply(frame, cache, stats)
+
+    frames = _run_frame_pipeline(decode_cmd, encode_cmd, (h, w, 3), process_frame, nframes, progress_callback,
+                                 queue_size=budget.pool, metrics=metrics)
+    _finish_stream(stream_dir, input_path, output_path, audio_codec, metrics)
+    return frames
+
+def _finish_stream(stream_dir, input_path, output_path, audio_codec, metrics):
+    """Join the streamed segments into output_path and mux the audio (no-op without stream_dir)."""
+    if stream_dir is None:
+        return
+    with metrics.stage('mux'):
+        _join_segments(stream_segments(stream_dir), input_path, output_path, audio_codec)
+
+def _roi_strip_bounds(bounds, video_w, video_h):
+    """
+    ROI strip (x1, y1, x2, y2) holding the plan's bounds, aligned to even
+    coordinates so the overlay lands exactly on yuv420p chroma samples.
+    """
+    x1, y1, x2, y2 = bounds
+    x1 -= x1 % 2
+    y1 -= y1 % 2
+    x2 = min(video_w, x2 + x2 % 2)
+    y2 = min(video_h, y2 + y2 % 2)
+    return x1, y1, x2, y2
+
+def _process_video_roi(input_path, output_path, plan, video_info, progress_callback=None, cache=None, stats=None,
+                       metrics=None, profile=None, stream_dir=None, budget=None):
+    """
+    Decode only the padded ROI strip (ffmpeg crops before handing frames to
+    Python), inpaint it, and composite it back onto the original frames with
+    ffmpeg's overlay filter inside one filter graph. The rest of the frame
+    never passes through Python.
+    Assumes a constant frame rate, since the patches are timed by frame index.
+    budget: Optional _Budget (buffer pool size).
+    Returns the number of frames processed.
+    """
+    w, h, fps, nframes, audio_codec = video_info
+    ffmpeg = get_setting("FFMPEG_BINARY")
+    budget = budget or _Budget()
+
+    if plan.roi is None:
+        # Nothing to inpaint: a plain re-encode through the pipe engine
+        return _process_video_pipe(input_path, output_path, plan, video_info, progress_callback, cache, stats, metrics,
+                                   profile, stream_dir, budget)
+
+    x1, y1, x2, y2 = _roi_strip_bounds(plan.bounds, w, h)
+    strip_w, strip_h = x2 - x1, y2 - y1
+    strip_plan = plan.crop(x1, y1, x2, y2)
+
+    decode_cmd = [ffmpeg, '-loglevel', 'error', '-i', input_path,
+                  '-vf', 'crop=%d:%d:%d:%d' % (strip_w, strip_h, x1, y1),
+                  '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-an', '-']
+    filter_graph = ('[0:v]setpts=PTS-STARTPTS[base];'
+                    '[1:v]setpts=PTS-STARTPTS[patch];'
+                    '[base][patch]overlay=%d:%d:eof_action=pass[v]' % (x1, y1))
+    encode_cmd = [ffmpeg, '-y', '-loglevel', 'error',
+                  '-i', input_path,
+                  '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', '%dx%d' % (strip_w, strip_h), '-r', repr(fps),
+                  '-i', '-',
+                  '-filter_complex', filter_graph, '-map', '[v]']
+    if audio_codec and stream_dir is None:
+        encode_cmd += ['-map', '0:a:0'] + audio_args(audio_codec)
+    encode_cmd += get_profile(profile).ffmpeg_args(encoder_threads()) + _output_args(output_path, stream_dir)
+
+    def process_frame(strip):
+        strip_plan.apply(strip, cache, stats)
+
+    frames = _run_frame_pipeline(decode_cmd, encode_cmd, (strip_h, strip_w, 3), process_frame, nframes,
+                                 progress_callback, queue_size=budget.pool, metrics=metrics)
+    _finish_stream(stream_dir, input_path, output_path, audio_codec, metrics)
+    return frames
+
+def _process_video_moviepy(input_path, output_path, mask_image, progress_callback, workers, cache, backend, stats, metrics,
+                           profile=None):
+    """
+    The moviepy engine (serial, or split into parallel segments).
+    Returns the number of frames processed.
     """
     clip = None
     new_clip = None
+    work_dir = None
 
     try:
         # Load video with reduced memory footprint
@@ -82,55 +927,65 @@ def process_video_with_mask(input_path, output_path, mask_image, progress_callba
 
         # Prepare mask
         # Resize mask to match video dimensions if needed
-        mask_h, mask_w = mask_image.shape[:2]
         video_w, video_h = clip.size
+        plan = _prepare_mask(mask_image, video_w, video_h, backend)
 
-        # Ensure mask matches video size
-        if (mask_w != video_w) or (mask_h != video_h):
-             # Resize mask using OpenCV (handling the boolean/grayscale properly)
-             mask_resized = cv2.resize(mask_image.astype(np.uint8), (video_w, video_h), interpolation=cv2.INTER_NEAREST)
-        else:
-            mask_resized = mask_image.astype(np.uint8)
+        if workers is None:
+            workers = os.cpu_count() or 1
 
-        # Threshold to ensure binary mask for inpainting (0 or 255)
-        # Assuming input mask might be anti-aliased or have alpha
-        _, mask_binary = cv2.threshold(mask_resized, 127, 255, cv2.THRESH_BINARY)
+        if workers > 1:
+            metrics.switch(None)
+            return _process_video_parallel(input_path, output_path, plan, clip, workers, progress_callback, cache, stats,
+                                           metrics, profile)
 
-        # Optimization: Calculate Bounding Box (ROI) of the mask
-        # This allows us to inpaint ONLY the watermark area, not the whole 4K frame.
-        points = cv2.findNonZero(mask_binary)
-        roi = None
-        if points is not None:
-            roi = cv2.boundingRect(points) # (x, y, w, h)
+        def inpaint(img):
+            if not plan.regions:
+                return img
+            # moviepy frames are read-only, hence the copy
+            with metrics.stage('inpaint'):
+                return plan.apply(img.copy(), cache, stats)
 
         # Apply processing
         # We use fl_image which applies the function to every frame
-        # Note: We pass the mask_binary and ROI captured in closure
-        new_clip = clip.fl_image(lambda img: inpaint_frame_opencv(img, mask_binary, roi=roi) if roi else img)
+        # Note: The plan is captured in closure
+        new_clip = clip.fl_image(inpaint)
 
         # Setup Logger
         logger = None
         if progress_callback:
-            logger = MyBarLogger(progress_callback)
+            # Also splits the write into its audio and video stages
+            logger = MyBarLogger(progress_callback, metrics)
         else:
             logger = 'bar'
 
-        # Write output file with optimized settings for Streamlit Cloud
-        # Use lower quality preset for faster processing and less memory
+        # AAC audio is stream-copied afterwards instead of moviepy decoding and re-encoding it
+        audio_codec = _probe_audio_codec(input_path) if clip.audio is not None else None
+        video_path = output_path
+        if audio_codec == 'aac':
+            work_dir = tempfile.mkdtemp()
+            video_path = os.path.join(work_dir, 'video.mp4')
+
+        metrics.switch('decode_encode')
+
+        # Encoder settings come from the profile (preset, CRF or bitrate, threads from the cores)
+        writer_kwargs = get_profile(profile).writer_kwargs(encoder_threads())
+        writer_kwargs['ffmpeg_params'] = (writer_kwargs['ffmpeg_params'] or []) + FASTSTART
         new_clip.write_videofile(
-            output_path,
-            codec='libx264',
+            video_path,
+            audio=audio_codec is not None and audio_codec != 'aac',
             audio_codec='aac',
             logger=logger,
-            preset='ultrafast',  # Faster encoding, less memory
-            threads=2,  # Reduced threads for cloud environment
-            bitrate='2000k'  # Lower bitrate to reduce memory usage
+            **writer_kwargs
         )
+        metrics.switch(None)
+        # Frames are inpainted inside the write loop; keep that time out of decode_encode
+        metrics.add_time('decode_encode', -metrics.stages.get('inpaint', 0.0))
 
-        return True, "Success"
+        if video_path != output_path:
+            with metrics.stage('mux'):
+                _mux_audio(video_path, input_path, output_path, audio_codec)
 
-    except Exception as e:
-        return False, str(e)
+        return int(new_clip.duration * new_clip.fps)
 
     finally:
         # Ensure clips are closed to free memory
@@ -144,3 +999,105 @@ def process_video_with_mask(input_path, output_path, mask_image, progress_callba
                 new_clip.close()
             except:
                 pass
+        if work_dir is not None:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+@traced('video')
+def process_video_with_mask(input_path, output_path, mask_image, progress_callback=None, workers=1, engine='moviepy', cache=None,
+                            backend=None, stats=None, metrics=None, encoder_profile=None, stream_dir=None,
+                            memory_budget_mb=None):
+    """
+    Process video frame by frame.
+    input_path: Path to input video.
+    output_path: Path to save output video.
+    mask_image: Boolean or 0-255 numpy array defining the region to remove.
+               Must match video aspect ratio/size roughly, or be resized.
+               A MaskPlan for the video size (e.g. from region_presets) may
+               be passed instead, which skips mask resizing and scanning.
+    progress_callback: Function that accepts a float (0.0 to 1.0) for progress updates.
+    workers: Number of worker processes. 1 processes the video serially,
+             more splits it into time segments processed in parallel.
+             None uses all available cores.
+    engine: 'moviepy' (default), 'pipe' or 'roi'. The pipe engine streams raw
+            frames between ffmpeg processes through reused buffers, skipping
+            moviepy's per-frame copies. The roi engine only sends the
+            watermark strip through Python and lets ffmpeg composite it back.
+    cache: Optional InpaintCache. Its hits/misses counters are kept current
+           while progress_callback runs, so the callback can report them.
+    backend: Inpainting backend: 'mean', 'patch', 'telea', 'ns' or 'auto'
+             (see inpainting.py). None uses the MaskPlan's backend, or
+             'telea' for a mask array.
+    stats: Optional BackendStats that receives the time spent per backend
+           (one is created if not given). It is summarized in the message.
+    metrics: Optional JobMetrics filled with per-stage times, frame and
+             cache counters, output size and peak memory.
+    encoder_profile: 'fast-preview' (default), 'balanced' or 'archival-crf'
+                     (see encoder_profiles.py). AAC audio is always
+                     stream-copied; other audio is encoded to AAC.
+    stream_dir: Optional existing directory for streaming output (pipe and
+                roi engines only). The video is first written there as
+                standalone MP4 segments of STREAM_SEGMENT_SECONDS, which
+                stream_segments() lists as each one finishes, so playback
+                can start while later frames are still being inpainted.
+                The segments have no audio; output_path is joined from
+                them, with the audio, at the end.
+    memory_budget_mb: Optional limit on the memory this job allocates (see
+                      _fit_budget); the rest of the process, such as other
+                      jobs and preview caches, is not counted, nor are the
+                      ffmpeg subprocesses. The moviepy engine becomes 'roi'
+                      (workers is ignored, and the message says so) and
+                      audio is always passed through by ffmpeg rather than
+                      loaded. Frames go through a fixed pool of buffers
+                      sized to the budget; if even two full frames do not
+                      fit, the pipe engine downscales the video, and
+                      otherwise the job fails with MemoryBudgetError.
+    A failed or cancelled run deletes its partly written output_path.
+    Returns (success, message).
+    """
+    start_time = time.time()
+    if stats is None:
+        stats = BackendStats()
+    if metrics is None:
+        metrics = JobMetrics('video')
+    metrics.begin()
+    base_hits, base_misses = (cache.hits, cache.misses) if cache is not None else (0, 0)
+    writing = False  # Set once output_path may hold a partial file
+
+    try:
+        metrics.switch('setup')
+        profile = get_profile(encoder_profile)
+        note = ""
+        if memory_budget_mb is not None and engine == 'moviepy':
+            engine = 'roi'  # moviepy holds the audio and copies every frame
+            note = " (roi engine used for the %d MB memory budget; workers ignored)" % memory_budget_mb
+        if engine in ('pipe', 'roi'):
+            video_info = _probe_video(input_path)
+            plan = _prepare_mask(mask_image, video_info[0], video_info[1], backend)
+            budget = _fit_budget(memory_budget_mb, engine, plan, video_info[0], video_info[1])
+            if budget.size is not None:
+                note += " (downscaled to %dx%d to fit %d MB)" % (budget.size + (memory_budget_mb,))
+            run = _process_video_pipe if engine == 'pipe' else _process_video_roi
+            metrics.switch(None)
+            writing = True
+            frames = run(input_path, output_path, plan, video_info, progress_callback, cache, stats, metrics, profile,
+                         stream_dir, budget)
+        elif engine != 'moviepy':
+            raise ValueError("Unknown engine: %s" % engine)
+        elif stream_dir is not None:
+            raise ValueError("Streaming output needs the pipe or roi engine")
+        else:
+            writing = True
+            frames = _process_video_moviepy(input_path, output_path, mask_image, progress_callback, workers,
+                                            cache, backend, stats, metrics, profile)
+
+        metrics.count('frames', frames)
+        if cache is not None:
+            metrics.count('cache_hits', cache.hits - base_hits)
+            metrics.count('cache_misses', cache.misses - base_misses)
+        metrics.backends = stats.summary()
+        return metrics.finish(True, _summary(frames, time.time() - start_time, stats, metrics) + note, output_path)
+
+    except Exception as e:
+        if writing and os.path.exists(output_path):
+            os.remove(output_path)
+        return metrics.finish(False, str(e))
@@ -0,0 +1,58 @@
+from functools import lru_cache
+
+from processor import MaskPlan
+
+# Watermark regions as normalized (x, y, w, h), relative to the frame/page
+# size, so one preset fits 720p, 1080p and 4K alike.
+REGION_PRESETS = {
+    # NotebookLM logo: 1101,660-1238,681 on 1280x720 video,
+    # 1265,745-1369,762 on a 1376x768 slide page.
+    'notebooklm': {
+        'label': 'NotebookLM 오른쪽 하단 (bottom-right)',
+        'video': (1101 / 1280, 660 / 720, 137 / 1280, 21 / 720),
+        'pdf': (1265 / 1376, 745 / 768, 104 / 1376, 17 / 768),
+    },
+}
+
+
+def normalized_region(name, kind):
+    """Normalized (x, y, w, h) of a preset for 'video' or 'pdf'."""
+    if name not in REGION_PRESETS:
+        raise ValueError(f"Unknown region preset: {name}")
+    return REGION_PRESETS[name][kind]
+
+
+def scale_region(region, width, height):
+    """
+    Pixel (x_start, y_start, x_end, y_end) of a normalized (x, y, w, h)
+    region on a width x height frame.
+    """
+    nx, ny, nw, nh = region
+    return (int(round(nx * width)), int(round(ny * height)),
+            int(round((nx + nw) * width)), int(round((ny + nh) * height)))
+
+
+def preset_rect(name, width, height, kind='video'):
+    """Pixel (x_start, y_start, x_end, y_end) of a preset at the given size."""
+    return scale_region(normalized_region(name, kind), width, height)
+
+
+@lru_cache(maxsize=32)
+def _template_plan(region, width, height, backend):
+    x0, y0, x1, y1 = scale_region(region, width, height)
+    return MaskPlan.from_rects([(x0, y0, x1 - x0, y1 - y0)], (width, height), backend=backend)
+
+
+def region_plan(region, width, height, backend='telea'):
+    """
+    MaskPlan for a normalized region on a width x height video.
+    The padded, dilated ROI masks are built once per (region, width, height,
+    backend) and cached; every call returns a copy with its own scratch
+    buffers.
+    """
+    return _template_plan(tuple(region), int(width), int(height), backend).copy()
+
+
+def preset_plan(name, width, height, backend='telea'):
+    """MaskPlan for a preset at the given video size (cached, see region_plan)."""
+    return region_plan(normalized_region(name, 'video'), width, height, backend)
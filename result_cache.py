@@ -0,0 +1,185 @@
+"""
+Content-addressed cache of finished job outputs on local disk.
+
+An entry is keyed by the SHA-256 of the input file and the request
+parameters (region, backend, encoder settings, ...), so the same upload
+processed the same way reuses the stored output. Entries are evicted least
+recently used first once the cache exceeds its size cap.
+
+Lookups short-circuit on a quick fingerprint (file size plus head and tail
+samples): the full hash is only computed when some entry's input has the
+same fingerprint.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from hashing import FileDigests, quick_fingerprint
+
+# Bump when processing changes so that older results are not reused
+# (2: entries are copies, no longer hard links that later jobs could overwrite)
+RESULT_VERSION = 2
+
+META_FILE = 'meta.json'
+
+
+def _copy_replace(src, dst):
+    """
+    Copy src to a temporary name beside dst and rename it over dst. Entries
+    and job outputs never share an inode, so ffmpeg or PyMuPDF rewriting one
+    of them in place cannot change the other, and an existing dst is
+    replaced rather than written through.
+    """
+    tmp_path = '%s.%d-%d.tmp' % (dst, os.getpid(), threading.get_ident())
+    try:
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ResultCache:
+    """
+    root: Directory of the cache (created if missing). None uses
+          <system temp>/magic-remover-results.
+    max_bytes: Size cap for all stored outputs together.
+    Each entry is a directory <root>/<key>/ holding the output file and
+    meta.json; the entry's last use is the mtime of meta.json, so the LRU
+    order survives restarts.
+    """
+    def __init__(self, root=None, max_bytes=2 * 2**30):
+        self.root = root or os.path.join(tempfile.gettempdir(), 'magic-remover-results')
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (quick fingerprint, output file, bytes), oldest first
+        self._quick = {}  # quick fingerprint -> number of entries
+        self._digests = FileDigests()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._load()
+
+    def fetch(self, input_path, params, output_path):
+        """
+        Place the stored output for (input file, params) at output_path.
+        Returns True on a hit, False if the result has to be computed.
+        """
+        quick = quick_fingerprint(input_path)
+        with self._lock:
+            if quick not in self._quick:
+                self.misses += 1
+                return False
+        key = self._key(self._digests.sha256(input_path), params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False
+        entry_dir = os.path.join(self.root, key)
+        # Copy outside the lock; an entry evicted meanwhile shows up as FileNotFoundError
+        try:
+            _copy_replace(os.path.join(entry_dir, entry[1]), output_path)
+            found = True
+        except FileNotFoundError:
+            found = False
+        with self._lock:
+            if not found:
+                # Removed behind our back; forget it
+                if key in self._entries:
+                    self._drop(key)
+                self.misses += 1
+                return False
+            if key in self._entries:
+                try:
+                    os.utime(os.path.join(entry_dir, META_FILE))
+                except FileNotFoundError:
+                    pass
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def store(self, input_path, params, output_path):
+        """Add the output of a finished job, then evict down to max_bytes."""
+        quick = quick_fingerprint(input_path)
+        digest = self._digests.sha256(input_path)
+        key = self._key(digest, params)
+        name = 'output' + os.path.splitext(output_path)[1]
+
+        # Build the entry aside and rename it into place, so a crash never leaves half an entry
+        work_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.root)
+        try:
+            shutil.copyfile(output_path, os.path.join(work_dir, name))
+            with open(os.path.join(work_dir, META_FILE), 'w') as f:
+                json.dump({'version': RESULT_VERSION, 'quick': quick, 'input_sha256': digest, 'params': params, 'file': name,
+                           'created': time.time()}, f)
+            with self._lock:
+                if key in self._entries:
+                    return
+                os.rename(work_dir, os.path.join(self.root, key))
+                work_dir = None
+                self._add(key, quick, name, os.path.getsize(os.path.join(self.root, key, name)))
+                self._evict()
+        finally:
+            if work_dir is not None:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        """Bytes of all stored outputs."""
+        return self._bytes
+
+    def _key(self, digest, params):
+        payload = json.dumps({'version': RESULT_VERSION, 'input': digest, 'params': params}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf8')).hexdigest()
+
+    def _add(self, key, quick, name, size):
+        self._entries[key] = (quick, name, size)
+        self._quick[quick] = self._quick.get(quick, 0) + 1
+        self._bytes += size
+
+    def _evict(self):
+        # Least recently used first, but always keep the newest entry
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        quick, _, size = self._entries.pop(key)
+        self._bytes -= size
+        self._quick[quick] -= 1
+        if not self._quick[quick]:
+            del self._quick[quick]
+        shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+
+    def _load(self):
+        """Index the entries left by earlier runs, oldest use first; drop broken ones."""
+        found = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            if entry.name.startswith('.tmp-'):
+                shutil.rmtree(entry.path, ignore_errors=True)
+                continue
+            meta_path = os.path.join(entry.path, META_FILE)
+            try:
+                with open(meta_path) as f:
+                    meta = json.load(f)
+                if meta.get('version') != RESULT_VERSION:
+                    raise ValueError('stale entry')
+                size = os.path.getsize(os.path.join(entry.path, meta['file']))
+                found.append((os.path.getmtime(meta_path), entry.name, meta['quick'], meta['file'], size))
+            except (OSError, ValueError, KeyError):
+                shutil.rmtree(entry.path, ignore_errors=True)
+        for _, key, quick, name, size in sorted(found):
+            self._add(key, quick, name, size)
+        self._evict()
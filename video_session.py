@@ -0,0 +1,198 @@
+import atexit
+import re
+import subprocess
+import threading
+from collections import OrderedDict
+
+import cv2
+from moviepy.config import get_setting
+
+
+def build_keyframe_index(video_path, fps):
+    """
+    Frame indexes of the video's keyframes, sorted.
+    Only keyframes are decoded (-skip_frame nokey), so this is fast even on
+    long files. Returns None if ffmpeg fails.
+    """
+    cmd = [get_setting("FFMPEG_BINARY"), '-hide_banner', '-nostats', '-skip_frame', 'nokey',
+           '-i', video_path, '-an', '-vf', 'showinfo', '-f', 'null', '-']
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    times = re.findall(rb'pts_time:\s*(-?[\d.]+)', result.stderr)
+    return sorted({int(round(float(t) * fps)) for t in times})
+
+
+class VideoSession:
+    """
+    Preview state for one uploaded video, built once at upload time.
+    Keeps a single capture handle open, a keyframe index, and an LRU of
+    decoded frames, so slider moves seek as little as possible and
+    coordinate-only edits never decode again.
+    max_bytes: Memory budget for cached frames.
+    prefetch: Frames decoded ahead of the requested one in a background
+              thread (0 disables prefetching).
+    """
+    def __init__(self, video_path, max_bytes=256 * 1024 * 1024, prefetch=0):
+        self.path = video_path
+        self.max_bytes = max_bytes
+        self.prefetch = prefetch
+        self.keyframes = None
+
+        self._cap = cv2.VideoCapture(video_path)
+        self.frame_count = int(self._cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS) or 0.0
+
+        self._next = 0  # Index of the frame the capture returns next
+        self._frames = OrderedDict()  # index -> RGB frame
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+        # The keyframe index is only an optimization; build it off the upload path
+        if self.fps:
+            threading.Thread(target=self._index_keyframes, daemon=True).start()
+
+        self._prefetch_from = None
+        self._prefetch_event = threading.Event()
+        if prefetch:
+            threading.Thread(target=self._prefetch_loop, daemon=True).start()
+
+    @property
+    def opened(self):
+        return self._cap.isOpened()
+
+    def frame(self, index):
+        """
+        RGB frame at index (read-only; copy before drawing on it), or None
+        if it cannot be decoded.
+        """
+        index = int(index)
+        with self._lock:
+            frame = self._cached(index)
+            if frame is None:
+                frame = self._decode(index)
+        if frame is not None and self.prefetch:
+            self._prefetch_from = index + 1
+            self._prefetch_event.set()
+        return frame
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._cap.release()
+            self._frames.clear()
+            self._bytes = 0
+        self._prefetch_event.set()
+
+    def _cached(self, index):
+        frame = self._frames.get(index)
+        if frame is not None:
+            self._frames.move_to_end(index)
+        return frame
+
+    def _decode(self, index):
+        if self._closed:
+            return None
+        if index != self._next and not self._can_read_forward(index):
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self._next = index
+
+        # Decode forward from the current position up to the target
+        while self._next < index:
+            if not self._cap.grab():
+                return None
+            self._next += 1
+
+        ret, frame = self._cap.read()
+        if not ret or frame is None:
+            return None
+        self._next = index + 1
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        frame.flags.writeable = False
+        self._store(index, frame)
+        return frame
+
+    def _can_read_forward(self, index):
+        """
+        True if reaching index by decoding forward from the current position
+        is no more work than seeking (which decodes from the keyframe).
+        """
+        if index < self._next:
+            return False
+        if self.keyframes is None:
+            # No index yet: only read forward over short distances
+            return index - self._next <= max(int(self.fps), 1)
+        # A seek lands on the last keyframe <= index; if that is at or before
+        # the current position, seeking would decode those frames again.
+        keyframe = 0
+        for k in self.keyframes:
+            if k > index:
+                break
+            keyframe = k
+        return keyframe <= self._next
+
+    def _store(self, index, frame):
+        self._frames[index] = frame
+        self._bytes += frame.nbytes
+        while self._bytes > self.max_bytes and len(self._frames) > 1:
+            _, evicted = self._frames.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def _index_keyframes(self):
+        keyframes = build_keyframe_index(self.path, self.fps)
+        if keyframes:
+            self.keyframes = keyframes
+
+    def _prefetch_loop(self):
+        while True:
+            self._prefetch_event.wait()
+            self._prefetch_event.clear()
+            if self._closed:
+                return
+            start = self._prefetch_from
+            for index in range(start, min(start + self.prefetch, self.frame_count)):
+                with self._lock:
+                    # Stop when the slider moved on, and never seek: prefetching
+                    # only pays off while it continues from the current position
+                    if self._prefetch_event.is_set() or self._closed:
+                        break
+                    if self._cached(index) is not None:
+                        continue
+                    if index != self._next or self._decode(index) is None:
+                        break
+
+
+_sessions = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+def get_session(video_path, max_sessions=4, **kwargs):
+    """
+    Session for video_path, created on first use. The least recently used
+    sessions are closed once more than max_sessions are open.
+    """
+    with _sessions_lock:
+        session = _sessions.get(video_path)
+        if session is not None:
+            _sessions.move_to_end(video_path)
+            return session
+        session = _sessions[video_path] = VideoSession(video_path, **kwargs)
+        while len(_sessions) > max_sessions:
+            _, evicted = _sessions.popitem(last=False)
+            evicted.close()
+        return session
+
+
+@atexit.register
+def close_all_sessions():
+    """Close every session (also run at exit so no decode is cut off mid-call)."""
+    with _sessions_lock:
+        while _sessions:
+            _, session = _sessions.popitem()
+            session.close()
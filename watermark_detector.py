@@ -0,0 +1,175 @@
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from moviepy.config import get_setting
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+from region_presets import normalized_region
+
+# Score multiplier of regions near the prior region (e.g. the preset's logo spot)
+PRIOR_BOOST = 3.0
+# Score weight of a region in the middle of the frame, relative to one in a corner
+CENTER_WEIGHT = 0.25
+
+_PTS_TIME = re.compile(rb'pts_time:\s*(-?[\d.]+)')
+
+
+def _grab_frame(video_path, t, size, keyframes_only=True):
+    """
+    One grayscale frame near time t, scaled to size (w, h), and the source
+    timestamp of the frame that was decoded; (None, None) on failure.
+    """
+    w, h = size
+    # Input seeking jumps through the container index; with -skip_frame nokey
+    # the decoder then only touches the keyframe at/before t.
+    skip = ['-skip_frame', 'nokey', '-noaccurate_seek'] if keyframes_only else []
+    # -copyts keeps source timestamps, which showinfo reports on stderr
+    cmd = [get_setting("FFMPEG_BINARY"), '-hide_banner', '-loglevel', 'info'] + skip + [
+           '-ss', '%.3f' % t, '-copyts', '-i', video_path, '-an', '-frames:v', '1',
+           '-vf', 'showinfo,scale=%d:%d,format=gray' % (w, h), '-f', 'rawvideo', '-pix_fmt', 'gray', '-']
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0 or len(result.stdout) < w * h:
+        return None, None
+    match = _PTS_TIME.search(result.stderr)
+    pts = float(match.group(1)) if match else None
+    return np.frombuffer(result.stdout[:w * h], dtype=np.uint8).reshape(h, w), pts
+
+
+def sample_frames(video_path, samples=16, max_width=640):
+    """
+    Grayscale frames spread evenly across the video, downscaled to at most
+    max_width. Each sample is a separate seek that decodes a single keyframe
+    (run concurrently), so the cost does not grow with the length of the
+    video. Clips with too few keyframes for distinct samples (several seeks
+    landing on the same keyframe timestamp) are re-sampled with exact seeks;
+    identical-looking frames at different timestamps, as in a static slide
+    deck, do not count as too few.
+    Returns (frames, (width, height)) where frames is an (N, h, w) uint8 array
+    and (width, height) the full video size.
+    """
+    infos = ffmpeg_parse_infos(video_path)
+    width, height = infos['video_size']
+    if infos.get('video_rotation') in (90, 270):
+        width, height = height, width
+    duration = infos.get('video_duration') or infos.get('duration') or 0
+
+    scale = min(1.0, max_width / width)
+    size = (max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2))
+    # Sample the middle of each of `samples` equal slices of the video
+    times = [duration * (i + 0.5) / samples for i in range(samples)]
+
+    frames = []
+    with ThreadPoolExecutor(max_workers=min(samples, 8)) as pool:
+        for keyframes_only in (True, False):
+            grabbed = [g for g in pool.map(lambda t: _grab_frame(video_path, t, size, keyframes_only), times)
+                       if g[0] is not None]
+            frames = [frame for frame, _ in grabbed]
+            # Sparse keyframes make neighbouring seeks land on the same keyframe;
+            # a frame whose timestamp is unknown counts as distinct
+            stamps = [pts for _, pts in grabbed]
+            distinct = len(set(p for p in stamps if p is not None)) + stamps.count(None)
+            if frames and distinct >= min(3, samples):
+                break
+
+    if not frames:
+        return np.empty((0, size[1], size[0]), dtype=np.uint8), (width, height)
+    return np.stack(frames), (width, height)
+
+
+def _region_weight(box, size, prior):
+    """
+    Prior weight of a candidate box (x, y, w, h) on a frame of size (w, h):
+    watermarks sit in corners, and near the prior region if one is given.
+    """
+    x, y, w, h = box
+    width, height = size
+    cx, cy = (x + w / 2) / width, (y + h / 2) / height
+    # 0 at a corner, 1 at the center
+    corner = min(1.0, 2 * np.hypot(min(cx, 1 - cx), min(cy, 1 - cy)) / np.hypot(1, 1))
+    weight = 1.0 - (1.0 - CENTER_WEIGHT) * corner
+    if prior is not None:
+        px, py, pw, ph = prior
+        # The prior grown by its own size on every side, as the logo moves between exports
+        if (x / width < px + 2 * pw and (x + w) / width > px - pw and
+                y / height < py + 2 * ph and (y + h) / height > py - ph):
+            weight *= PRIOR_BOOST
+    return weight
+
+
+def detect_static_overlay(video_path, samples=16, max_width=640, std_threshold=6.0,
+                          edge_threshold=40.0, max_area=0.05, max_regions=1, prior='notebooklm',
+                          min_confidence=0.6):
+    """
+    Locate a static overlay (logo/watermark) by temporal median and variance.
+    Pixels that barely change across frames sampled over the whole video and
+    sit on strong edges of the median frame are overlay candidates; nearby
+    candidates are grouped into regions, scored by their candidate pixels
+    weighted towards the corners and the prior region, and the best kept.
+    Short or mostly static videos leave slide text static too, so a result
+    is only returned when it clearly beats the next candidate.
+    samples: Number of frames sampled across the video.
+    std_threshold: Max temporal standard deviation (0~255) of a static pixel.
+    edge_threshold: Min gradient magnitude of the median frame at overlay pixels.
+    max_area: Regions whose bounding box covers more than this fraction of the
+              frame are ignored (static slide backgrounds, borders).
+    max_regions: Number of regions returned.
+    prior: Preset name or normalized (x, y, w, h) where the watermark is
+           expected (regions there score PRIOR_BOOST times higher), or None.
+    min_confidence: Min share of the weakest kept region's score in it plus
+                    the best rejected one's (0.5 is a tie).
+    Returns (mask, roi): a full-resolution uint8 mask (0 or 255) ready for
+    process_video_with_mask and its (x, y, w, h) bounding box, or
+    (None, None) if no overlay was found or the result is unsure.
+    """
+    if isinstance(prior, str):
+        prior = normalized_region(prior, 'video')
+
+    frames, (width, height) = sample_frames(video_path, samples, max_width)
+    if len(frames) < 2:
+        return None, None
+
+    stack = frames.astype(np.float32)
+    median = np.median(stack, axis=0)
+    std = stack.std(axis=0)
+
+    gx = cv2.Sobel(median, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(median, cv2.CV_32F, 0, 1, ksize=3)
+    edges = cv2.magnitude(gx, gy)
+
+    candidates = ((std <= std_threshold) & (edges >= edge_threshold)).astype(np.uint8) * 255
+
+    # Join the strokes of a logo/wordmark into one blob
+    small_h, small_w = candidates.shape
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, small_w // 80), max(3, small_h // 120)))
+    blobs = cv2.morphologyEx(candidates, cv2.MORPH_CLOSE, kernel)
+
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(blobs, connectivity=8)
+    regions = []
+    for i in range(1, n):
+        x, y, w, h, _ = stats[i]
+        if w * h > max_area * small_w * small_h or w < 3 or h < 3:
+            continue
+        density = np.count_nonzero(candidates[labels == i])
+        regions.append((density * _region_weight((x, y, w, h), (small_w, small_h), prior), i))
+    if not regions:
+        return None, None
+
+    regions.sort(reverse=True)
+    if len(regions) > max_regions:
+        kept, rejected = regions[max_regions - 1][0], regions[max_regions][0]
+        if kept / (kept + rejected) < min_confidence:
+            return None, None
+    small_mask = np.zeros_like(candidates)
+    for _, i in regions[:max_regions]:
+        x, y, w, h = stats[i, :4]
+        small_mask[y:y + h, x:x + w] = 255
+
+    # Back to full resolution, with a margin for the downscaling error
+    mask = cv2.resize(small_mask, (width, height), interpolation=cv2.INTER_NEAREST)
+    margin = max(2, int(round(width / small_w)))
+    mask = cv2.dilate(mask, np.ones((2 * margin + 1, 2 * margin + 1), np.uint8))
+    roi = cv2.boundingRect(cv2.findNonZero(mask))
+    return mask, roi